@@ -0,0 +1,54 @@
+"""
+Cardinality encodings: variables, clauses and solve time.
+
+The instance asks for exactly k of n inputs to be set,
+with each input forced to be equal to a random other input.
+
+    python benchmarks/bench_card.py [n] [k] [solver]
+"""
+import sys
+from random import Random
+from time import perf_counter
+
+from optisolveapi.sat import CNF
+
+ENCODINGS = ("seq", "totalizer", "mtotalizer", "sortnet")
+
+
+def bench(encoding, n, k, solver):
+    rnd = Random(n)
+    C = CNF.new(solver=solver)
+    xs = C.vars(n)
+    for i in range(0, n - 1, 2):
+        j = rnd.randrange(n)
+        C.add_clause([-xs[i], xs[j]])
+        C.add_clause([xs[i], -xs[j]])
+
+    n_vars = C.n_vars
+    n_clauses = C.n_clauses
+    t0 = perf_counter()
+    card = C.Card(xs, limit=k + 1, encoding=encoding)
+    t_enc = perf_counter() - t0
+
+    C.CardGEk(card, k)
+    C.CardLEk(card, k)
+    t0 = perf_counter()
+    sol = C.solve()
+    t_solve = perf_counter() - t0
+    assert sol is False or sum(C.sol_eval(sol, xs)) == k
+
+    print(
+        f"{encoding:>10} n={n} k={k}: "
+        f"vars {C.n_vars - n_vars:8d} clauses {C.n_clauses - n_clauses:8d} "
+        f"encode {t_enc:.3f}s solve {t_solve:.3f}s "
+        f"{'SAT' if sol else 'UNSAT'}"
+    )
+
+
+def main(n=2000, k=100, solver="pysat/cadical195"):
+    for encoding in ENCODINGS:
+        bench(encoding, int(n), int(k), solver)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,53 @@
+"""
+Sequential counter: clause generation by the Python loop and by NumPy.
+
+Builds Card(xs, limit=k) with CardLEk(card, k - 1) over n inputs,
+once with the NumPy path disabled and once with the default threshold,
+best of a few runs after a warmup.
+Backends without BULK_CLAUSES (PySAT) always use the loop;
+on the Writer both paths pay the same DIMACS encoding.
+
+    python benchmarks/bench_card_numpy.py [n] [k] [solver ...]
+"""
+import sys
+from time import perf_counter
+
+from optisolveapi.sat import CNF
+
+REPEAT = 3
+
+
+def bench(solver, n, k, cells):
+    C = CNF.new(solver=solver)
+    C.CARD_NUMPY_CELLS = cells
+    xs = C.vars(n)
+    t0 = perf_counter()
+    card = C.Card(xs, limit=k)
+    C.CardLEk(card, k - 1)
+    if hasattr(C, "flush"):
+        C.flush()
+    return perf_counter() - t0, C.n_clauses
+
+
+def best(solver, n, k, cells):
+    bench(solver, min(n, 1000), k, cells)
+    runs = [bench(solver, n, k, cells) for _ in range(REPEAT)]
+    return min(runs)
+
+
+def main(n=10000, k=50, *solvers):
+    n = int(n)
+    k = int(k)
+    for solver in solvers or ("formula", "writer", "pysat/cadical195"):
+        t_loop, n_clauses = best(solver, n, k, cells=float("inf"))
+        t_numpy, n_clauses2 = best(solver, n, k, cells=CNF.CARD_NUMPY_CELLS)
+        assert n_clauses == n_clauses2
+        print(
+            f"{solver:>18} n={n} k={k}: clauses {n_clauses:8d} "
+            f"loop {t_loop:.3f}s numpy {t_numpy:.3f}s "
+            f"x{t_loop / t_numpy:.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,52 @@
+"""
+DIMACS serialization throughput (MB/s):
+per-clause b" ".join (the old Writer.add_clause path)
+vs the batched encoder from optisolveapi.sat.formats.
+
+    python benchmarks/bench_dimacs.py [n_clauses]
+"""
+import sys
+from array import array
+from random import randrange
+from time import perf_counter
+
+from optisolveapi.sat import formats
+
+
+def old_encode(cs):
+    out = []
+    for c in cs:
+        out.append(b" ".join(b"%d" % v for v in c))
+        out.append(b" 0\n")
+    return b"".join(out)
+
+
+def bench(name, f, *args):
+    t0 = perf_counter()
+    data = f(*args)
+    t = perf_counter() - t0
+    print(f"{name:>24}: {len(data) / t / 2**20:8.1f} MB/s ({t:.3f}s)")
+    return data
+
+
+def main(n_clauses=10**6, n_vars=10**6):
+    cs = [
+        [randrange(1, n_vars) * (1 if randrange(2) else -1) for _ in range(3)]
+        for _ in range(n_clauses)
+    ]
+    lits = formats.flatten_clauses(cs)
+    print(f"{n_clauses} clauses, {len(lits)} literals (incl. terminators)")
+
+    ref = bench("per-clause join", old_encode, cs)
+    res = bench("batched (pure python)", formats._encode_clauses_python, lits)
+    assert res == ref
+    if formats.has_numpy:
+        res = bench("batched (numpy)", formats._encode_clauses_numpy, lits)
+        assert res == ref
+        lits = array("i", lits)
+        res = bench("batched (numpy, array)", formats._encode_clauses_numpy, lits)
+        assert res == ref
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,57 @@
+"""
+On-disk CNF formats: write time, file size and load time
+of plain / gzip / xz DIMACS and the binary format.
+
+    python benchmarks/bench_formats.py [n_clauses] [solver]
+"""
+import os
+import sys
+from random import randrange
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from optisolveapi.sat import CNF, Formula
+
+
+def bench(name, path, write, solver):
+    t0 = perf_counter()
+    write(path)
+    t_write = perf_counter() - t0
+
+    t0 = perf_counter()
+    if path.endswith(".bcnf"):
+        C = CNF.from_binary(path, solver=solver)
+    else:
+        C = CNF.from_dimacs(path, solver=solver)
+    t_load = perf_counter() - t0
+
+    print(
+        f"{name:>8}: size {os.path.getsize(path) / 2**20:8.2f} MB "
+        f"write {t_write:6.3f}s load {t_load:6.3f}s ({C.n_clauses} clauses)"
+    )
+
+
+def main(n_clauses=10**6, solver="formula"):
+    n_vars = n_clauses // 4
+    F = Formula()
+    F.vars(n_vars)
+    F.add_clauses([
+        [randrange(2, n_vars) * (1 if randrange(2) else -1) for _ in range(3)]
+        for _ in range(n_clauses)
+    ])
+
+    with TemporaryDirectory() as tmp:
+        for name, ext in (
+            ("dimacs", ".cnf"),
+            ("gzip", ".cnf.gz"),
+            ("xz", ".cnf.xz"),
+        ):
+            bench(name, os.path.join(tmp, "test" + ext), F.write_dimacs, solver)
+        bench("binary", os.path.join(tmp, "test.bcnf"), F.write_binary, solver)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args:
+        args[0] = int(args[0])
+    main(*args)
@@ -1,5 +1,8 @@
 from .base import CNF
-from .simple import Formula, Writer
+from .simple import Formula, Writer, Template
+from .model import Model
+from .bitvec import BitVec
 from .pysat import PySAT, has_pysat
 from .ext import ExtSolver
+from .portfolio import Portfolio
 from .funcs import *
@@ -1,9 +1,27 @@
 import logging
+from array import array
+from collections import namedtuple
+from copy import deepcopy
+from contextlib import contextmanager
+from time import perf_counter
+
+try:
+    import numpy as np
+    has_numpy = True
+except ImportError:
+    has_numpy = False
 
 from optisolveapi.vector import Vector
 from optisolveapi.solver_base import SolverBase
 
 from .constraints import Constraints
+from .formats import flatten_clauses, split_clauses, read_dimacs, read_binary
+from .model import Model
+
+
+MinimizeResult = namedtuple("MinimizeResult", ("optimum", "sol", "iterations"))
+# bound: number of true literals assumed / cost lower bound (core)
+MinimizeStep = namedtuple("MinimizeStep", ("bound", "sat", "time"))
 
 
 class CNF(SolverBase, Constraints):
@@ -16,6 +34,22 @@ class CNF(SolverBase, Constraints):
 
     log = logging.getLogger("CNF")
 
+    # clauses are passed to the solver in batches of this size
+    # (see add_clause(), flush() and batch())
+    CLAUSE_BUFFER = 4096
+    # add_clauses_flat() stores NumPy arrays as they are,
+    # bulk encoders (Card) generate clauses as arrays only if this is set
+    BULK_CLAUSES = False
+
+    # attributes holding the backend (not copied by fork() or pickled,
+    # init_solver() creates them)
+    BACKEND_STATE = ("_solver", "_pending")
+    # attributes copied by fork() (backend options are not)
+    MODEL_STATE = (
+        "n_clauses", "_log",
+        "_card_cache", "card_cache_stats", "_xor_rows", "_gates",
+    )
+
     def __init__(self, solver=None):
         if type(self) is CNF:
             raise TypeError("Creation of CNF problems should be done using CNF.new(solver=...)")
@@ -25,6 +59,15 @@ class CNF(SolverBase, Constraints):
         self.n_vars = 0
         self.n_clauses = 0
         self.solver = solver
+        self._pending = []
+        self._batch_depth = 0
+        self._log = None
+        self.init_solver(solver)
+
+        self._card_cache = {}
+        self.card_cache_stats = {"hits": 0, "misses": 0}
+        self._xor_rows = []
+        self._gates = {}
 
         self.ZERO = self.var()
         self.add_clause([-self.ZERO])
@@ -32,9 +75,26 @@ class CNF(SolverBase, Constraints):
 
         self.log.info(f"SAT solver '{solver}'")
 
+    @classmethod
+    def new(cls, *args, clause_log=False, **opts):
+        """
+        clause_log: keep all clauses in an array (see start_clause_log)
+        """
+        cnf = super().new(*args, **opts)
+        if clause_log:
+            cnf.start_clause_log()
+        return cnf
+
+    def init_solver(self, solver):
+        pass
+
     def solve(self, assumptions=()):
         raise NotImplementedError()
 
+    def get_core(self):
+        """Failed assumptions after an UNSAT solve()."""
+        raise NotImplementedError()
+
     def var(self):
         self.n_vars += 1
         return self.n_vars
@@ -44,28 +104,290 @@ class CNF(SolverBase, Constraints):
 
     def add_clause(self, c):
         self.n_clauses += 1
-        self._solver.add_clause(c)
+        self._pending.append(list(c))
+        if self._log is not None:
+            self._log.extend(c)
+            self._log.append(0)
+        if len(self._pending) >= self.CLAUSE_BUFFER and not self._batch_depth:
+            self._flush_pending()
 
     def add_clauses(self, cs):
         self.n_clauses += len(cs)
-        self._solver.append_formula(cs)
+        if self._log is not None:
+            self._log.extend(flatten_clauses(cs))
+        # copied, as in add_clause, the caller may reuse the lists
+        self._pending.extend(list(c) for c in cs)
+        if len(self._pending) >= self.CLAUSE_BUFFER and not self._batch_depth:
+            self._flush_pending()
+
+    def flush(self):
+        """
+        Add the collected XOR equations (see xor_flush)
+        and pass buffered clauses to the solver.
+        Called before solving or writing the formula out.
+        """
+        if self._xor_rows:
+            self.xor_flush()
+        self._flush_pending()
+
+    def _flush_pending(self):
+        """
+        Pass buffered clauses to the solver (only them: the XOR system
+        is eliminated as a whole on flush()).
+        """
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self._solver.append_formula(pending)
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer all clauses added inside the block
+        and pass them to the solver at once at the end
+        (or on flush() / solve()).
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._flush_pending()
+
+    def add_clauses_flat(self, lits):
+        """Add clauses given as a flat 0-terminated literal array."""
+        self.add_clauses(split_clauses(lits))
+
+    # Clause log: fork() and pickling replay all clauses into a new backend
+
+    def start_clause_log(self):
+        """
+        Keep all clauses added from now on in an array('i') (clause_log),
+        only possible right after creation (CNF.new(..., clause_log=True)).
+        Backends storing the clauses themselves (Formula, Writer)
+        have the log anyway.
+        """
+        assert self.n_clauses == 1, "clauses were added before the log"
+        self._log = array("i", [-self.ZERO, 0])
+
+    @property
+    def clause_log(self):
+        """All clauses as a flat 0-terminated literal array."""
+        if self._log is None:
+            raise ValueError(f"clause log is not enabled for {self.solver}")
+        return self._log
+
+    def fork(self, solver=None):
+        """
+        New CNF with the same clauses, variables and caches
+        on the backend solver (the same as this one by default).
+        The clauses are replayed from clause_log in one bulk call.
+        """
+        lits = self.clause_log
+        res = CNF.new(solver=solver or self.solver)
+        # the first clause [-ZERO] is already there
+        assert list(lits[:2]) == [-self.ZERO, 0] and res.ZERO == self.ZERO
+        res.n_vars = self.n_vars
+        res.add_clauses_flat(lits[2:])
+        for key in self.MODEL_STATE:
+            setattr(res, key, deepcopy(getattr(self, key)))
+        return res
+
+    def __getstate__(self):
+        """
+        Pickled as clause_log and the Python-side attributes,
+        the backend is rebuilt by replaying the clauses.
+        """
+        state = {
+            key: value for key, value in self.__dict__.items()
+            if key not in self.BACKEND_STATE
+        }
+        state["_clause_log"] = self.clause_log
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        lits = state.pop("_clause_log")
+        self.__dict__.update(state)
+        self._pending = []
+        self.init_solver(self.solver)
+        # init_solver may reset some of the attributes (Writer's solver)
+        self.__dict__.update(state)
+        self._log = None
+        self.add_clauses_flat(lits)
+        self.n_clauses = state["n_clauses"]
+        self._log = state["_log"]
+
+    @classmethod
+    def from_dimacs(cls, path, solver=None, shift=None):
+        """
+        Load a DIMACS file (plain, .gz, .xz or .bz2) into a new CNF.
+
+        Variable 1 of a CNF is ZERO, so file variables are shifted by
+        shift (v -> v + shift). By default, files starting with the
+        clause "-1 0" (as written by this package) are loaded as they are
+        (that clause is skipped), other files are shifted by 1.
+        """
+        cnf = cls.new(solver=solver)
+        chunks = read_dimacs(path)
+        header = next(chunks)
+        n_vars = header[0] if header else 0
+        for lits in chunks:
+            if shift is None:
+                shift = 0 if list(lits[:2]) == [-1, 0] else 1
+                if shift == 0:
+                    lits = lits[2:]
+            if has_numpy:
+                if len(lits):
+                    n_vars = max(n_vars, int(abs(lits).max()))
+                lits = lits + shift * np.sign(lits)
+            else:
+                n_vars = max([n_vars] + [abs(v) for v in lits])
+                lits = [v + shift if v > 0 else v - shift if v else 0 for v in lits]
+            cnf.add_clauses_flat(lits)
+        cnf.n_vars = max(cnf.n_vars, n_vars + (1 if shift is None else shift))
+        return cnf
+
+    @classmethod
+    def from_binary(cls, path, solver=None):
+        """
+        Load a binary CNF file (see Formula.write_binary) into a new CNF.
+        The literal array is mmap'ed and passed to the backend as is.
+        """
+        n_vars, lits, offsets = read_binary(path)
+        cnf = cls.new(solver=solver)
+        # the first clause is [-ZERO], already added
+        assert list(lits[:offsets[1]]) == [-1, 0]
+        cnf.add_clauses_flat(lits[offsets[1]:])
+        cnf.n_vars = max(cnf.n_vars, n_vars)
+        return cnf
 
     def make_assumption(self, xs, values):
         return [x if bit else -x for x, bit in zip(xs, values)]
 
     def sol_eval(self, sol, vec):
+        if isinstance(sol, Model):
+            return sol.eval(vec)
         return tuple(sol[abs(v)] ^ (1 if v < 0 else 0) for v in vec if v)
 
+    def sol_eval_many(self, sol, vecs):
+        if isinstance(sol, Model):
+            return sol.eval_many(vecs)
+        return [self.sol_eval(sol, vec) for vec in vecs]
+
     def apply(self, cnf, inp):
+        """
+        Add a copy of the Formula cnf with its variables 2, 3, ...
+        replaced by the literals inp.
+        cnf can also be a Template (see Formula.compile), then
+        its auxiliary variables are fresh ones, which are returned.
+        """
+        if not isinstance(cnf, CNF):
+            return cnf.instantiate(self, inp)
+        cnf.flush()
         assert cnf.n_vars == 1 + len(inp)
         assert cnf.clauses[0] == [-cnf.ZERO] == [-1]
-        mapping = {1: 1, -1: -1}
         # 0 is skipped, 1 is ZERO
         # starting at 2
-        for i, v in enumerate(inp):
-            i += 2
-            mapping[i] = v
-            mapping[-i] = -v
+        mapping = [0, 1] + list(inp)
+        self.add_clauses_flat([
+            mapping[i] if i >= 0 else -mapping[-i]
+            for i in cnf.clauses[1:].lits
+        ])
+
+    def apply_many(self, template, inps):
+        """
+        Add a copy of the Template per input vector of inps
+        in a single add_clauses_flat() call,
+        returns the auxiliary variables of each copy.
+        """
+        return template.instantiate_many(self, inps)
+
+    def minimize(self, lits, strategy="linear", assumptions=()):
+        """
+        Minimize the number of true literals among lits.
+        Everything is done incrementally through assumptions,
+        on the same solver instance.
+
+        strategy:
+            "linear" - SAT-UNSAT search, bound decreasing from the last model
+            "binary" - binary search on the bound
+            "core" - core-guided search (OLL, as in RC2), requires get_core()
+
+        Returns MinimizeResult(optimum, sol, iterations),
+        optimum is None (and sol is False) if there is no solution;
+        iterations lists MinimizeStep(bound, sat, time) per solve() call.
+        """
+        lits = list(lits)
+        assumptions = list(assumptions)
+        steps = []
+
+        def solve(bound, extra):
+            t0 = perf_counter()
+            sol = self.solve(assumptions=assumptions + extra)
+            step = MinimizeStep(bound, bool(sol), perf_counter() - t0)
+            self.log.info(
+                f"minimize ({strategy}) bound {bound}:"
+                f" {'SAT' if sol else 'UNSAT'} in {step.time:.3f}s"
+            )
+            steps.append(step)
+            return sol
+
+        if strategy == "core":
+            sol = self._minimize_core(lits, solve)
+        elif strategy in ("linear", "binary"):
+            sol = self._minimize_search(lits, solve, binary=strategy == "binary")
+        else:
+            raise ValueError(f"unknown minimization strategy {strategy}")
+
+        if not sol:
+            return MinimizeResult(None, False, steps)
+        return MinimizeResult(sum(self.sol_eval(sol, lits)), sol, steps)
+
+    def _minimize_search(self, lits, solve, binary):
+        sol = solve(None, [])
+        if not sol or not lits:
+            return sol
+        hi = sum(self.sol_eval(sol, lits))
+        if hi == 0:
+            return sol
+
+        card = self.Card(lits, limit=hi)
+        lo = 0
+        while lo < hi:
+            bound = (lo + hi) // 2 if binary else hi - 1
+            res = solve(bound, self.CardLEkAssumptions(card, bound))
+            if res:
+                sol = res
+                hi = sum(self.sol_eval(sol, lits))
+            else:
+                lo = bound + 1
+        return sol
+
+    def _minimize_core(self, lits, solve):
+        assert len(set(lits)) == len(lits), "repeated literals"
+        # soft literal -> (counter, index) if it is a counter output;
+        # a soft literal costs 1 if true
+        softs = {v: None for v in lits if v != self.ZERO}
+        cost = sum(1 for v in lits if v == self.ONE)
+        softs.pop(self.ONE, None)
+        while True:
+            sol = solve(cost, [-v for v in softs])
+            if sol:
+                return sol
 
-        for c in cnf.clauses[1:]:
-            self.add_clause([mapping[i] for i in c])
+            core = [-v for v in self.get_core() or () if -v in softs]
+            if not core:
+                return False
+            cost += 1
+            for v in core:
+                info = softs.pop(v)
+                if info is not None:
+                    card, i = info
+                    if i + 1 < len(card) and card[i+1] != self.ZERO:
+                        softs[card[i+1]] = card, i + 1
+            if len(core) > 1:
+                # at least one of the core is true (paid by cost above),
+                # each extra one costs 1
+                card = self.Card(core, encoding="totalizer")
+                softs[card[2]] = card, 2
@@ -0,0 +1,192 @@
+from functools import reduce
+
+from optisolveapi.vector import Vector
+
+
+class BitVec(Vector):
+    """
+    Vector of literals of a CNF, interpreted as an unsigned integer
+    (most significant bit first, as everywhere in Vector).
+
+    Bitwise operations and arithmetic add clauses to the CNF
+    through its hashed gates (AND/OR/XOR/ITE), so repeated
+    subexpressions are shared. Arithmetic is modulo 2^len.
+
+        x, y = BitVec.new(C, 32), BitVec.new(C, 32)
+        z = (x + y).rol(7) ^ y
+        C.add_clause([z.eq(0x1234)])
+    """
+    # "ripple" or "cla" (Kogge-Stone carry-lookahead)
+    ADD = "ripple"
+
+    def __init__(self, cnf, lits=()):
+        super().__init__(lits)
+        self.cnf = cnf
+        self.ZERO = cnf.ZERO
+
+    @classmethod
+    def new(cls, cnf, n):
+        return cls(cnf, cnf.vars(n))
+
+    @classmethod
+    def const(cls, cnf, value, n):
+        assert 0 <= value < 2**n
+        return cls(cnf, [
+            cnf.ONE if value >> i & 1 else cnf.ZERO
+            for i in reversed(range(n))
+        ])
+
+    def make(self, lst):
+        lst = list(lst)
+        if self.WIDTH is not None:
+            assert len(lst) == self.WIDTH
+        return type(self)(self.cnf, lst)
+
+    def _coerce(self, other):
+        if isinstance(other, int):
+            return self.const(self.cnf, other % 2**len(self), len(self))
+        assert len(other) == len(self)
+        return other
+
+    def eval(self, sol):
+        """Integer value in a solution."""
+        res = 0
+        for bit in self.cnf.sol_eval(sol, self):
+            res = res << 1 | bit
+        return res
+
+    # bitwise
+
+    def __xor__(self, other):
+        other = self._coerce(other)
+        return self.make(map(self.cnf.XOR, self, other))
+
+    def __and__(self, other):
+        other = self._coerce(other)
+        return self.make(map(self.cnf.AND, self, other))
+
+    def __or__(self, other):
+        other = self._coerce(other)
+        return self.make(map(self.cnf.OR, self, other))
+
+    __rxor__ = __xor__
+    __rand__ = __and__
+    __ror__ = __or__
+
+    def __invert__(self):
+        return self.make(-a for a in self)
+
+    # arithmetic
+
+    def add(self, other, carry=None, method=None):
+        """(sum, carry out) of self + other + carry"""
+        other = self._coerce(other)
+        if carry is None:
+            carry = self.cnf.ZERO
+        method = method or self.ADD
+        if method == "ripple":
+            return self._add_ripple(other, carry)
+        elif method == "cla":
+            return self._add_cla(other, carry)
+        raise ValueError(f"unknown addition method {method!r}")
+
+    def _add_ripple(self, other, carry):
+        C = self.cnf
+        res = []
+        for a, b in zip(reversed(self), reversed(other)):
+            p = C.XOR(a, b)
+            res.append(C.XOR(p, carry))
+            carry = C.OR(C.AND(a, b), C.AND(p, carry))
+        return self.make(reversed(res)), carry
+
+    def _add_cla(self, other, carry):
+        # Kogge-Stone parallel prefix over (generate, propagate),
+        # bit 0 is the least significant one here
+        C = self.cnf
+        ps = [C.XOR(a, b) for a, b in zip(reversed(self), reversed(other))]
+        gs = [C.AND(a, b) for a, b in zip(reversed(self), reversed(other))]
+        if not ps:
+            return self.make([]), carry
+        gs[0] = C.OR(gs[0], C.AND(ps[0], carry))
+
+        G = list(gs)
+        P = list(ps)
+        d = 1
+        while d < len(G):
+            G, P = (
+                [g if i < d else C.OR(g, C.AND(p, G[i-d]))
+                 for i, (g, p) in enumerate(zip(G, P))],
+                [p if i < d else C.AND(p, P[i-d])
+                 for i, p in enumerate(P)],
+            )
+            d *= 2
+
+        carries = [carry] + G[:-1]
+        res = [C.XOR(p, c) for p, c in zip(ps, carries)]
+        return self.make(reversed(res)), G[-1]
+
+    def __add__(self, other):
+        return self.add(other)[0]
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        other = self._coerce(other)
+        return self.add(~other, carry=self.cnf.ONE)[0]
+
+    def __rsub__(self, other):
+        return self._coerce(other) - self
+
+    def __neg__(self):
+        """Two's complement negation (use ~ for bitwise negation)."""
+        return self.const(self.cnf, 0, len(self)) - self
+
+    def __mul__(self, k):
+        """Multiplication by a constant (shift-and-add)."""
+        if not isinstance(k, int):
+            return NotImplemented
+        k %= 2**len(self)
+        res = self.const(self.cnf, 0, len(self))
+        for i in range(len(self)):
+            if k >> i & 1:
+                res = res + self.shl(i)
+        return res
+
+    __rmul__ = __mul__
+
+    # comparisons (literals)
+
+    def eq(self, other):
+        other = self._coerce(other)
+        C = self.cnf
+        return reduce(C.AND, (-C.XOR(a, b) for a, b in zip(self, other)), C.ONE)
+
+    def ne(self, other):
+        return -self.eq(other)
+
+    def ult(self, other):
+        # self < other iff self - other borrows
+        other = self._coerce(other)
+        return -self.add(~other, carry=self.cnf.ONE)[1]
+
+    def ule(self, other):
+        return -self._coerce(other).ult(self)
+
+    def ugt(self, other):
+        return self._coerce(other).ult(self)
+
+    def uge(self, other):
+        return -self.ult(other)
+
+    def _flip_sign(self):
+        return self.make([-self[0]] + list(self[1:]))
+
+    def slt(self, other):
+        """Signed (two's complement) self < other."""
+        return self._flip_sign().ult(self._coerce(other)._flip_sign())
+
+    def sle(self, other):
+        return -self._coerce(other).slt(self)
+
+    def __repr__(self):
+        return "<BitVec len=%d list=%r>" % (len(self), list(self))
@@ -1,13 +1,127 @@
+from bisect import bisect_right
+from collections import deque
+from itertools import product
+from math import gcd
 from random import shuffle
 
+try:
+    import numpy as np
+    has_numpy = True
+except ImportError:
+    has_numpy = False
+
 from optisolveapi.vector import Vector
 
+from .formats import CHUNK
+
 _shuffle = shuffle
 
 
+def _oddeven_pairs(size, p=1):
+    """
+    Comparators of Batcher's odd-even merge sort of size (power of 2).
+    Starting from p > 1 gives only the merging of sorted blocks of size p.
+    """
+    pairs = []
+    while p < size:
+        k = p
+        while k >= 1:
+            for j in range(k % p, size - k, 2 * k):
+                for i in range(k):
+                    if (i + j) // (2 * p) == (i + j + k) // (2 * p):
+                        pairs.append((i + j, i + j + k))
+            k //= 2
+        p *= 2
+    return pairs
+
+
 class Constraints:
     """Mix-in for CNF"""
 
+    def _add_clause_const(self, c):
+        """add_clause() skipping ZERO literals and clauses with ONE"""
+        if self.ONE in c:
+            return
+        self.add_clause([v for v in c if v != self.ZERO])
+
+    # Gates with structural hashing: the output of a gate is created once
+    # per CNF for each (normalized) input combination, see self._gates
+
+    def AND(self, a, b):
+        if a == self.ZERO or b == self.ZERO or a == -b:
+            return self.ZERO
+        if a == self.ONE or a == b:
+            return b
+        if b == self.ONE:
+            return a
+        if a > b:
+            a, b = b, a
+        key = ("and", a, b)
+        ab = self._gates.get(key)
+        if ab is None:
+            ab = self._gates[key] = self.var()
+            self.constraint_and(a, b, ab)
+        return ab
+
+    def OR(self, a, b):
+        return -self.AND(-a, -b)
+
+    def XOR(self, a, b):
+        if a == self.ZERO:
+            return b
+        if b == self.ZERO:
+            return a
+        if a == self.ONE:
+            return -b
+        if b == self.ONE:
+            return -a
+        if a == b:
+            return self.ZERO
+        if a == -b:
+            return self.ONE
+        neg = (a < 0) ^ (b < 0)
+        a, b = sorted((abs(a), abs(b)))
+        key = ("xor", a, b)
+        ab = self._gates.get(key)
+        if ab is None:
+            ab = self._gates[key] = self.var()
+            self._xor_clauses([a, b, ab], 0)
+        return -ab if neg else ab
+
+    def ITE(self, c, t, e):
+        """c ? t : e"""
+        if c == self.ONE or t == e:
+            return t
+        if c == self.ZERO:
+            return e
+        if c < 0:
+            c, t, e = -c, e, t
+        if t == -e:
+            return self.XOR(c, e)
+        if t == self.ONE or t == c:
+            return self.OR(c, e)
+        if t == self.ZERO or t == -c:
+            return self.AND(-c, e)
+        if e == self.ONE or e == -c:
+            return self.OR(-c, t)
+        if e == self.ZERO or e == c:
+            return self.AND(c, t)
+        neg = t < 0
+        if neg:
+            t, e = -t, -e
+        key = ("ite", c, t, e)
+        res = self._gates.get(key)
+        if res is None:
+            res = self._gates[key] = self.var()
+            self.add_clause([-c, -t, res])
+            self.add_clause([-c, t, -res])
+            self.add_clause([c, -e, res])
+            self.add_clause([c, e, -res])
+            # redundant, helps propagation
+            self.add_clause([-t, -e, res])
+            self.add_clause([t, e, -res])
+        return -res if neg else res
+
     def constraint_unary(self, vec):
         for a, b in zip(vec, vec[1:]):
             self.add_clause([a, -b])
@@ -34,6 +148,105 @@ class Constraints:
         # b=0 => a=1
         self.add_clause([-b, a])
 
+    # XOR constraints are split into chunks of this size
+    # (a chunk of k literals takes 2^(k-1) clauses)
+    XOR_CHUNK = 4
+    # collect XORs and run Gauss-Jordan elimination on xor_flush()
+    XOR_GAUSS = False
+
+    def constraint_xor(self, lits, rhs=0):
+        """
+        XOR of lits equals rhs.
+        With XOR_GAUSS, the equation is only collected,
+        clauses are added by xor_flush().
+        """
+        row = rhs & 1
+        for v in lits:
+            if v == self.ZERO:
+                continue
+            if v == self.ONE or v < 0:
+                row ^= 1
+            if v != self.ONE:
+                row ^= 1 << abs(v)
+        if self.XOR_GAUSS:
+            self._xor_rows.append(row)
+        else:
+            self._xor_row_clauses(row)
+
+    def Xor(self, lits):
+        """Variable equal to the XOR of lits."""
+        lits = [v for v in lits if v != self.ZERO]
+        if not lits:
+            return self.ZERO
+        if len(lits) == 1:
+            return lits[0]
+        res = self.var()
+        self.constraint_xor(list(lits) + [res], 0)
+        return res
+
+    def xor_flush(self):
+        """
+        Gauss-Jordan elimination over GF(2) of the collected XOR system
+        (rows are int bitmasks: bit 0 is the right-hand side,
+        bit v is variable v), then adding the reduced equations:
+        implied equations are dropped and fixed variables become units.
+        Returns the number of equations added.
+        """
+        rows, self._xor_rows = self._xor_rows, []
+
+        # echelon form, pivot is the highest variable of the row
+        pivots = {}
+        for row in rows:
+            while row > 1:
+                p = row.bit_length() - 1
+                if p not in pivots:
+                    pivots[p] = row
+                    break
+                row ^= pivots[p]
+            if row == 1:
+                # 0 = 1
+                self.add_clause([self.ZERO])
+                return 0
+
+        # back-substitution, from the lowest pivot
+        order = sorted(pivots)
+        for i, p in enumerate(order):
+            bit = 1 << p
+            for q in order[i+1:]:
+                if pivots[q] & bit:
+                    pivots[q] ^= pivots[p]
+
+        for p in order:
+            self._xor_row_clauses(pivots[p])
+        return len(order)
+
+    def _xor_row_clauses(self, row):
+        rhs = row & 1
+        row ^= rhs
+        vs = []
+        while row:
+            low = row & -row
+            vs.append(low.bit_length() - 1)
+            row ^= low
+
+        # Tseitin chunking: x1 ^ ... ^ xk = t
+        chunk = max(self.XOR_CHUNK, 3)
+        while len(vs) > chunk:
+            t = self.var()
+            self._xor_clauses(vs[:chunk-1] + [t], 0)
+            vs = [t] + vs[chunk-1:]
+        self._xor_clauses(vs, rhs)
+
+    def _xor_clauses(self, vs, rhs):
+        if not vs:
+            if rhs:
+                self.add_clause([self.ZERO])
+            return
+        for vals in product(range(2), repeat=len(vs)):
+            if sum(vals) & 1 != rhs:
+                # forbid this assignment
+                self.add_clause([-v if val else v for v, val in zip(vs, vals)])
+
     # def SeqInc(self, vec):
     #     return [self.ONE] + list(vec)
 
@@ -110,7 +323,11 @@ class Constraints:
     #         self.add_clause(vec[c-1])
     #         self.add_clause(-vec[c])
 
-    def Card(self, vec, limit=None, shuffle=False):
+    CARD_ENCODING = "seq"
+    # reuse counters built over the same inputs (or their prefixes)
+    CARD_CACHE = True
+
+    def Card(self, vec, limit=None, shuffle=False, encoding=None):
         """
         [Sinz2005]-like cardinality.
         Returns:
@@ -124,54 +341,404 @@ class Constraints:
         [0, 1, 2] l=3
         limit = 3
         [0, 1, 2, Z] l=4
+
+        encoding (default CARD_ENCODING):
+            "seq" - sequential counter [Sinz2005]
+            "totalizer" - totalizer [BailleuxBoufkhad2003]
+            "mtotalizer" - modulo totalizer [Ogawa+2013]
+            "sortnet" - odd-even merge sorting network [Batcher1968],
+                        pruned to the first limit outputs
+        All encodings give the same output (each output is equivalent
+        to the respective >= condition).
+
+        If CARD_CACHE is set, counters are memoized per instance
+        (by the input sequence and limit; for "seq" also by prefixes),
+        see card_cache_stats.
         """
         if limit is None:
-            nvars = len(vec)
             limit = len(vec) + 1
-        else:
-            nvars = min(limit, len(vec))
 
         assert vec
-        if len(vec) == 1:
-            res = [self.ONE, vec[0]]
-            res += [self.ZERO] * (limit + 1 - len(res))
-            return res
-
         if shuffle:
             vec = list(vec)
             _shuffle(vec)
 
-        sub = self.Card(vec[:-1], limit=limit, shuffle=False)
-        res = [self.ONE] + [self.var() for _ in range(nvars)]
+        if encoding is None:
+            encoding = self.CARD_ENCODING
+        if encoding == "seq":
+            return self._card_seq(vec, limit)
+
+        key = encoding, tuple(vec), limit
+        if self.CARD_CACHE and key in self._card_cache:
+            self.card_cache_stats["hits"] += 1
+            return list(self._card_cache[key])
+
+        if encoding == "totalizer":
+            res = self._card_totalizer(vec, limit)
+        elif encoding == "mtotalizer":
+            res = self._card_mtotalizer(vec, limit)
+        elif encoding == "sortnet":
+            res = self._card_sortnet(vec, limit)
+        else:
+            raise ValueError(f"unknown cardinality encoding {encoding}")
+        res = res[:limit + 1]
         res += [self.ZERO] * (limit + 1 - len(res))
-        var = vec[-1]
-
-        # res[i] = card >= i
-
-        # res[0] = True
-        # res[1] = sub[1] | var
-        self.constraint_or(sub[1], var, res[1])
-        for i in range(2, nvars + 1):
-            # res[i] = sub[i] | (sub[i-1] & var)
-            if len(sub) >= i + 1 and sub[i] != self.ZERO:
-                x0, x1, x2, x3 = sub[i], sub[i-1], var, res[i]
-
-                # Sinz claims that if we encode Cardinality <= k
-                # then clauses with -x3 can be dropped.
-                # Indeed, this only would allow a bad assignment,
-                # but a good one would still exist if and only if card <= k.
-                # However, this seems to contradict with his claim
-                # that LT_SEQ is decided by unit propagation.
-                self.add_clause([x1, -x3])  # full is [x0, x1, -x3] but unarity gives x1 <= x0
-                self.add_clause([x0, x2, -x3])
-                self.add_clause([-x1, -x2, x3])
-                self.add_clause([-x0, x3])
+
+        if self.CARD_CACHE:
+            self.card_cache_stats["misses"] += 1
+            self._card_cache[key] = tuple(res)
+        return res
+
+    def _card_seq(self, vec, limit):
+        # counters of all prefixes are cached in a trie:
+        # (node, next literal) -> (child node, first output of the counter)
+        # (outputs of one counter are consecutive variables)
+        if self.CARD_CACHE:
+            trie = self._card_cache.setdefault(("seq", limit), {})
+        else:
+            trie = {}
+
+        node = 0
+        n = 0
+        first = None
+        while n < len(vec) and (node, vec[n]) in trie:
+            node, first = trie[node, vec[n]]
+            n += 1
+        if self.CARD_CACHE:
+            self.card_cache_stats["hits"] += n
+            self.card_cache_stats["misses"] += len(vec) - n
+
+        if n == 0:
+            n = 1
+            first = vec[0]
+            child = len(trie) + 1
+            trie[0, first] = child, first
+            node = child
+        if n == 1:
+            res = [self.ONE, first]
+        else:
+            res = [self.ONE] + list(range(first, first + min(limit, n)))
+        res += [self.ZERO] * (limit + 1 - len(res))
+
+        if (
+            has_numpy and self.BULK_CLAUSES
+            and (len(vec) - n) * min(limit, len(vec)) > self.CARD_NUMPY_CELLS
+        ):
+            return self._card_seq_numpy(vec, limit, n, first, trie, node)
+
+        for n in range(n + 1, len(vec) + 1):
+            # extend counter for vec[:n-1] by var
+            sub = res
+            var = vec[n-1]
+            nvars = min(limit, n)
+            res = [self.ONE] + [self.var() for _ in range(nvars)]
+            res += [self.ZERO] * (limit + 1 - len(res))
+
+            # res[i] = card >= i
+
+            # res[0] = True
+            # res[1] = sub[1] | var
+            self.constraint_or(sub[1], var, res[1])
+            for i in range(2, nvars + 1):
+                # res[i] = sub[i] | (sub[i-1] & var)
+                if len(sub) >= i + 1 and sub[i] != self.ZERO:
+                    x0, x1, x2, x3 = sub[i], sub[i-1], var, res[i]
+
+                    # Sinz claims that if we encode Cardinality <= k
+                    # then clauses with -x3 can be dropped.
+                    # Indeed, this only would allow a bad assignment,
+                    # but a good one would still exist if and only if card <= k.
+                    # However, this seems to contradict with his claim
+                    # that LT_SEQ is decided by unit propagation.
+                    self.add_clause([x1, -x3])  # full is [x0, x1, -x3] but unarity gives x1 <= x0
+                    self.add_clause([x0, x2, -x3])
+                    self.add_clause([-x1, -x2, x3])
+                    self.add_clause([-x0, x3])
+                else:
+                    assert i in (n, limit)
+                    assert sub[i] == self.ZERO
+                    self.constraint_and(sub[i-1], var, res[i])
+
+            child = len(trie) + 1
+            trie[node, var] = child, res[1]
+            node = child
+        return res
+
+    # counters with more cells (inputs x outputs) are generated by NumPy
+    # (on backends with BULK_CLAUSES)
+    CARD_NUMPY_CELLS = 256
+
+    def _card_seq_numpy(self, vec, limit, n0, first0, trie, node):
+        """
+        The loop of _card_seq for levels n0+1..len(vec) as one block:
+        same variables (outputs of level n are min(limit, n) consecutive
+        variables) and the same clauses in the same order.
+        """
+        N = len(vec)
+        levels = np.arange(n0 + 1, N + 1)
+        k = np.minimum(limit, levels)
+        firsts = self.n_vars + 1 + np.concatenate(([0], np.cumsum(k)[:-1]))
+        self.n_vars += int(k.sum())
+
+        # previous level: first output and number of outputs
+        prev_first = np.concatenate(([first0], firsts[:-1]))
+        prev_k = np.minimum(limit, levels - 1)
+
+        X = np.asarray(vec[n0:], dtype=np.int64)
+
+        # levels up to limit grow the counter, cell by cell;
+        # the rest have limit outputs after limit outputs, all alike
+        m = max(0, min(limit, N) - n0)
+        blocks = []
+        if m:
+            blocks.append(self._card_seq_cells(
+                k[:m], prev_k[:m], firsts[:m], prev_first[:m], X[:m],
+            ))
+        if m < len(levels):
+            blocks.append(self._card_seq_steady(
+                limit, firsts[m:], prev_first[m:], X[m:],
+            ))
+        self.add_clauses_flat(np.concatenate(blocks))
+
+        for var, first in zip(vec[n0:], firsts.tolist()):
+            child = len(trie) + 1
+            trie[node, var] = child, first
+            node = child
+
+        res = [self.ONE] + list(range(firsts[-1], firsts[-1] + int(k[-1])))
+        res += [self.ZERO] * (limit + 1 - len(res))
+        return res
+
+    # clauses of a cell: a = sub[i-1], b = sub[i], x = var, r = res[i]
+    # (as in _card_seq): constraint_or(sub[1], var, res[1]),
+    # res[i] = sub[i] | (sub[i-1] & var),
+    # constraint_and(sub[i-1], var, res[i]) (no sub[i])
+    _CARD_CELL_OR = ((2, 3, -4), (-2, 4), (-3, 4))
+    _CARD_CELL_FULL = ((1, -4), (2, 3, -4), (-1, -3, 4), (-2, 4))
+    _CARD_CELL_AND = ((-1, -3, 4), (1, -4), (3, -4))
+
+    @classmethod
+    def _card_seq_cells(cls, k, prev_k, firsts, prev_first, X):
+        """Flat clauses of the levels with k outputs, cell by cell."""
+        # cells (level, i) for i = 1..k of each level
+        lvl = np.repeat(np.arange(len(k)), k)
+        i = np.arange(len(lvl)) - np.repeat(np.cumsum(k) - k, k) + 1
+        # literals are indices into cols, +-1 based
+        cols = np.stack([
+            prev_first[lvl] + i - 2,
+            prev_first[lvl] + i - 1,
+            X[lvl],
+            firsts[lvl] + i - 1,
+        ]).astype(np.int32)
+        kind = np.where(i == 1, 0, np.where(i <= prev_k[lvl], 1, 2))
+        templates = (cls._CARD_CELL_OR, cls._CARD_CELL_FULL, cls._CARD_CELL_AND)
+        # one row of 0-terminated clauses per cell, sized for the full
+        # kind (14), the tail of or/and rows (10 + 4) is dropped;
+        # full cells are the majority, they are filled in for all cells first
+        rows = np.zeros((len(lvl), 14), dtype=np.int32)
+        keep = np.ones((len(lvl), 14), dtype=bool)
+        for t in (1, 0, 2):
+            idx = slice(None) if t == 1 else np.flatnonzero(kind == t)
+            pos = 0
+            for c in templates[t]:
+                for lit in c:
+                    col = cols[abs(lit) - 1, idx]
+                    rows[idx, pos] = col if lit > 0 else -col
+                    pos += 1
+                rows[idx, pos] = 0
+                pos += 1
+            if t != 1:
+                keep[idx, pos:] = False
+        return rows[keep]
+
+    @classmethod
+    def _card_seq_steady(cls, limit, firsts, prev_first, X):
+        """
+        Flat clauses of levels with limit outputs after limit outputs:
+        an or cell and limit - 1 full cells, the same row for every level
+        up to the variables, so the block is a single broadcast.
+        """
+        # a literal is sign * (base + offset), bases are
+        # 0 (clause end), prev_first, var, first
+        base, offset, sign = [], [], []
+        for i in range(1, limit + 1):
+            cell = (0, i - 2), (0, i - 1), (1, 0), (2, i - 1)
+            for c in cls._CARD_CELL_FULL if i > 1 else cls._CARD_CELL_OR:
+                for lit in c:
+                    b, off = cell[abs(lit) - 1]
+                    base.append(b + 1)
+                    offset.append(off)
+                    sign.append(1 if lit > 0 else -1)
+                base.append(0)
+                offset.append(0)
+                sign.append(1)
+
+        bases = np.stack([
+            np.zeros(len(X), dtype=np.int32),
+            prev_first.astype(np.int32),
+            X.astype(np.int32),
+            firsts.astype(np.int32),
+        ], axis=1)
+        rows = bases[:, base]
+        rows += np.array(offset, dtype=np.int32)
+        rows *= np.array(sign, dtype=np.int32)
+        return rows.ravel()
+
+    def _add_clauses_columns(self, *columns):
+        """Add clauses [columns[0][j], columns[1][j], ...] for every j."""
+        if not len(columns[0]):
+            return
+        if has_numpy and self.BULK_CLAUSES:
+            flat = np.zeros((len(columns[0]), len(columns) + 1), dtype=np.int32)
+            for j, col in enumerate(columns):
+                flat[:, j] = col
+            self.add_clauses_flat(flat.ravel())
+        else:
+            self.add_clauses([list(c) for c in zip(*columns)])
+
+    def _card_merge(self, a, b, limit):
+        """
+        Totalizer node: unary sum of unary counters a and b
+        (starting with ONE, without padding), truncated at limit.
+        """
+        na = len(a) - 1
+        nb = len(b) - 1
+        m = min(na + nb, limit)
+        res = [self.ONE] + [self.var() for _ in range(m)]
+        for i in range(na + 1):
+            for j in range(min(nb, m - i) + 1):
+                s = i + j
+                if s:
+                    # a >= i & b >= j => res >= i + j
+                    self._add_clause_const([-a[i], -b[j], res[s]])
+                if s < m:
+                    # a < i + 1 & b < j + 1 => res < i + j + 1
+                    self._add_clause_const([
+                        a[i+1] if i < na else self.ZERO,
+                        b[j+1] if j < nb else self.ZERO,
+                        -res[s+1],
+                    ])
+        return res
+
+    def _card_totalizer(self, vec, limit):
+        nodes = [[self.ONE, v] for v in vec]
+        while len(nodes) > 1:
+            merged = [
+                self._card_merge(a, b, limit)
+                for a, b in zip(nodes[::2], nodes[1::2])
+            ]
+            if len(nodes) % 2:
+                merged.append(nodes[-1])
+            nodes = merged
+        return nodes[0]
+
+    def _card_mtotalizer(self, vec, limit, modulo=None):
+        # node value is q * modulo + r, both digits are unary counters
+        n = min(len(vec), limit)
+        if modulo is None:
+            modulo = max(2, round(n ** 0.5))
+        qcap = limit // modulo + 1
+
+        def merge(a, b):
+            ua, la = a
+            ub, lb = b
+            low = self._card_merge(la, lb, 2 * modulo - 2)
+            carry = low[modulo] if len(low) > modulo else self.ZERO
+
+            # l[t] = (low >= t & ~carry) | low >= modulo + t
+            lt = [self.ONE]
+            for t in range(1, min(modulo, len(low))):
+                if carry == self.ZERO:
+                    lt.append(low[t])
+                    continue
+                high = low[modulo+t] if modulo + t < len(low) else self.ZERO
+                v = self.var()
+                self._add_clause_const([-high, v])
+                self._add_clause_const([-low[t], carry, v])
+                self._add_clause_const([low[t], -v])
+                self._add_clause_const([-v, -carry, high])
+                lt.append(v)
+
+            ut = self._card_merge(ua, ub, qcap)
+            if carry != self.ZERO:
+                ut = self._card_merge(ut, [self.ONE, carry], qcap)
+            return ut, lt
+
+        nodes = [([self.ONE], [self.ONE, v]) for v in vec]
+        while len(nodes) > 1:
+            merged = [merge(a, b) for a, b in zip(nodes[::2], nodes[1::2])]
+            if len(nodes) % 2:
+                merged.append(nodes[-1])
+            nodes = merged
+        ut, lt = nodes[0]
+
+        def digit(lst, i):
+            return lst[i] if i < len(lst) else self.ZERO
+
+        res = [self.ONE]
+        for i in range(1, n + 1):
+            q, r = divmod(i, modulo)
+            if r == 0:
+                res.append(digit(ut, q))
             else:
-                assert i in (len(vec), limit)
-                assert sub[i] == self.ZERO
-                self.constraint_and(sub[i-1], var, res[i])
+                # >= q * modulo + r
+                res.append(self.OR(
+                    digit(ut, q + 1),
+                    self.AND(digit(ut, q), digit(lt, r)),
+                ))
         return res
 
+    def _card_sortnet(self, vec, limit):
+        # cardinality network [Asin+2011]-like:
+        # sort blocks of size >= limit, then merge them pairwise
+        # keeping only the top limit outputs
+        n = min(len(vec), limit)
+        size = 1
+        while size < n:
+            size *= 2
+
+        pad = [self.ZERO] * (size - n)
+        vec = list(vec) + [self.ZERO] * (-len(vec) % size)
+        sort_pairs = _oddeven_pairs(size)
+        seqs = [
+            self._sortnet(vec[i:i+size], sort_pairs, n) + pad
+            for i in range(0, len(vec), size)
+        ]
+
+        merge_pairs = _oddeven_pairs(2 * size, size)
+        while len(seqs) > 1:
+            merged = [
+                self._sortnet(a + b, merge_pairs, n) + pad
+                for a, b in zip(seqs[::2], seqs[1::2])
+            ]
+            if len(seqs) % 2:
+                merged.append(seqs[-1])
+            seqs = merged
+        return [self.ONE] + seqs[0][:n]
+
+    def _sortnet(self, wires, pairs, n):
+        """
+        Apply comparator network (sorting in descending order),
+        only gates leading to the first n outputs are kept.
+        Returns the first n outputs.
+        """
+        needed = set(range(n))
+        gates = []
+        for i, j in reversed(pairs):
+            gmax = i in needed
+            gmin = j in needed
+            if gmax or gmin:
+                gates.append((i, j, gmax, gmin))
+                needed.add(i)
+                needed.add(j)
+
+        wires = list(wires)
+        for i, j, gmax, gmin in reversed(gates):
+            a, b = wires[i], wires[j]
+            wires[i] = self.OR(a, b) if gmax else None
+            wires[j] = self.AND(a, b) if gmin else None
+        return wires[:n]
+
     def CardNeg(self, card):
         assert card[0] == self.ONE
         return card[:1] + [-v for v in card[1:][::-1]]
@@ -185,19 +752,40 @@ class Constraints:
         n = len(card) - 1
         assert card[0] == self.ONE
         assert 0 <= k < n
-        for i in range(k + 1, len(card)):
-            if card[i] is self.ZERO:
-                continue
-            self.add_clause([-card[i]])
+        self._add_clauses_columns([-v for v in card[k+1:] if v != self.ZERO])
 
     def CardGEk(self, card, k):
         n = len(card) - 1
         assert card[0] == self.ONE
         assert 0 <= k <= n
-        for i in range(k + 1):
-            if card[i] is self.ONE:
-                continue
-            self.add_clause([card[i]])
+        self._add_clauses_columns([v for v in card[:k+1] if v != self.ONE])
+
+    def CardLEkAssumptions(self, card, k):
+        """
+        Assumptions for card <= k, to be passed to solve(assumptions=...).
+        Unlike CardLEk, nothing is added permanently, so that the same
+        solver (and its learnt clauses) can be reused for other bounds.
+        The counter outputs are equivalent to the >= conditions,
+        so they serve as the activation literals themselves.
+        """
+        n = len(card) - 1
+        assert card[0] == self.ONE
+        assert 0 <= k < n
+        if card[k+1] == self.ZERO:
+            return []
+        return [-card[k+1]]
+
+    def CardGEkAssumptions(self, card, k):
+        """
+        Assumptions for card >= k (see CardLEkAssumptions).
+        """
+        n = len(card) - 1
+        assert card[0] == self.ONE
+        assert 0 <= k <= n
+        if card[k] == self.ONE:
+            return []
+        # assuming ZERO makes the problem UNSAT, as expected
+        return [card[k]]
 
     def CardAlignPad(self, a, b):
         n = min(len(a), len(b)) + 1
@@ -214,8 +802,255 @@ class Constraints:
         # Bad (greater):
         # 1
         # 0
-        for i in range(n):
-            self.add_clause([-a[i], b[i]])
+        self._add_clauses_columns([-v for v in a[:n]], b[:n])
+
+    PB_ENCODING = "auto"
+
+    def constraint_pb_le(self, lits, weights, k, encoding=None):
+        """
+        Pseudo-Boolean constraint sum(w_i * x_i) <= k
+        (weights and k are integers, may be negative).
+
+        encoding (default PB_ENCODING):
+            "bdd" - BDD with interval reduction [Abio+2012]
+            "gte" - generalized totalizer [Joshi+2015]
+            "adder" - binary adder network + comparator [EenSorensson2006]
+            "auto" - chosen by the weight distribution
+                     (equal weights are encoded by Card)
+        """
+        lits, weights, k = self._pb_normalize(lits, weights, k)
+        if k < 0:
+            self.add_clause([self.ZERO])
+            return
+        if not lits:
+            return
+
+        if encoding is None:
+            encoding = self.PB_ENCODING
+        if encoding == "auto":
+            encoding = self._pb_auto(weights, k)
+            self.log.debug(
+                f"PB constraint with {len(lits)} lits,"
+                f" weights {min(weights)}..{max(weights)}, k={k}: {encoding}"
+            )
+
+        if encoding == "card":
+            assert len(set(weights)) == 1
+            k //= weights[0]
+            card = self.Card(lits, limit=k + 1)
+            self.CardLEk(card, k)
+        elif encoding == "bdd":
+            self._pb_bdd(lits, weights, k)
+        elif encoding == "gte":
+            self._pb_gte(lits, weights, k)
+        elif encoding == "adder":
+            self._pb_adder(lits, weights, k)
+        else:
+            raise ValueError(f"unknown PB encoding {encoding}")
+
+    def constraint_pb_ge(self, lits, weights, k, encoding=None):
+        """
+        Pseudo-Boolean constraint sum(w_i * x_i) >= k,
+        see constraint_pb_le.
+        """
+        self.constraint_pb_le(
+            lits, [-w for w in weights], -k, encoding=encoding,
+        )
+
+    def _pb_normalize(self, lits, weights, k):
+        """
+        Positive weights, not exceeding k, no constants,
+        divided by the gcd, sorted by decreasing weight.
+        """
+        assert len(lits) == len(weights)
+        terms = {}
+        for x, w in zip(lits, weights):
+            if w < 0:
+                # w*x = w - w*(1-x)
+                x, w = -x, -w
+                k += w
+            if x == self.ONE:
+                k -= w
+            elif x == self.ZERO or w == 0:
+                pass
+            elif -x in terms:
+                # w1*x + w2*(1-x) = w2 + (w1-w2)*x
+                w2 = terms.pop(-x)
+                k -= min(w, w2)
+                if w != w2:
+                    terms[x if w > w2 else -x] = abs(w - w2)
+            else:
+                terms[x] = terms.get(x, 0) + w
+
+        if k < 0:
+            return [], [], k
+
+        res = []
+        for x, w in terms.items():
+            if w > k:
+                self.add_clause([-x])
+            else:
+                res.append((w, x))
+
+        if sum(w for w, x in res) <= k:
+            return [], [], k
+
+        res.sort(key=lambda wx: -wx[0])
+        g = 0
+        for w, x in res:
+            g = gcd(g, w)
+        weights = [w // g for w, x in res]
+        lits = [x for w, x in res]
+        return lits, weights, k // g
+
+    def _pb_auto(self, weights, k):
+        if len(set(weights)) == 1:
+            return "card"
+        # BDD size is bounded by the number of nodes (i, k)
+        if len(weights) * (k + 1) <= 10**5:
+            return "bdd"
+        # with few distinct weights, there are few distinct partial sums
+        if len(set(weights)) <= 4:
+            return "gte"
+        return "adder"
+
+    def _pb_bdd(self, lits, weights, k):
+        n = len(lits)
+        rest = [0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            rest[i] = rest[i+1] + weights[i]
+
+        # node (i, K) = [sum(w_j * x_j for j >= i) <= K],
+        # nodes are memoized per level by intervals of equivalent K:
+        # sorted starts, ends, literals
+        memo = [([], [], []) for _ in range(n + 1)]
+        inf = rest[0] + 1
+
+        def get(i, K):
+            if K < 0:
+                return -inf, -1, self.ZERO
+            if K >= rest[i]:
+                return rest[i], inf, self.ONE
+            los, his, vs = memo[i]
+            j = bisect_right(los, K) - 1
+            if j >= 0 and K <= his[j]:
+                return los[j], his[j], vs[j]
+            return None
+
+        stack = [(0, k)]
+        while stack:
+            i, K = stack[-1]
+            if get(i, K) is not None:
+                stack.pop()
+                continue
+
+            x = lits[i]
+            w = weights[i]
+            node0 = get(i + 1, K)
+            node1 = get(i + 1, K - w)
+            if node0 is None:
+                stack.append((i + 1, K))
+            if node1 is None:
+                stack.append((i + 1, K - w))
+            if node0 is None or node1 is None:
+                continue
+            stack.pop()
+
+            lo0, hi0, v0 = node0
+            lo1, hi1, v1 = node1
+            if v0 == v1:
+                v = v0
+            else:
+                v = self.var()
+                # v => (x=0 branch), v & x => (x=1 branch)
+                self._add_clause_const([-v, v0])
+                self._add_clause_const([-v, -x, v1])
+            lo = max(lo0, lo1 + w)
+            hi = min(hi0, hi1 + w)
+            los, his, vs = memo[i]
+            j = bisect_right(los, lo)
+            los.insert(j, lo)
+            his.insert(j, hi)
+            vs.insert(j, v)
+
+        self._add_clause_const([get(0, k)[2]])
+
+    def _pb_gte(self, lits, weights, k):
+        # node: partial sum value -> literal implied by reaching it,
+        # sums over k are forbidden right away
+        nodes = [{w: x} for x, w in zip(lits, weights)]
+        while len(nodes) > 1:
+            merged = []
+            for a, b in zip(nodes[::2], nodes[1::2]):
+                res = {}
+                for sa, la in [(0, self.ONE)] + list(a.items()):
+                    for sb, lb in [(0, self.ONE)] + list(b.items()):
+                        s = sa + sb
+                        if s == 0:
+                            continue
+                        if s > k:
+                            self._add_clause_const([-la, -lb])
+                            continue
+                        if s not in res:
+                            res[s] = self.var()
+                        self._add_clause_const([-la, -lb, res[s]])
+                merged.append(res)
+            if len(nodes) % 2:
+                merged.append(nodes[-1])
+            nodes = merged
+
+    def _pb_adder(self, lits, weights, k):
+        # columns of bits to be summed, reduced by full/half adders
+        columns = {}
+        for x, w in zip(lits, weights):
+            b = 0
+            while w:
+                if w & 1:
+                    columns.setdefault(b, deque()).append(x)
+                w >>= 1
+                b += 1
+
+        bits = []
+        b = 0
+        while b <= max(columns):
+            col = columns.get(b, deque())
+            while len(col) >= 3:
+                s, c = self._full_adder(col.popleft(), col.popleft(), col.popleft())
+                col.append(s)
+                columns.setdefault(b + 1, deque()).append(c)
+            if len(col) == 2:
+                x, y = col.popleft(), col.popleft()
+                columns.setdefault(b + 1, deque()).append(self.AND(x, y))
+                col.append(self.XOR(x, y))
+            bits.append(col[0] if col else self.ZERO)
+            b += 1
+
+        # forbid sum > k:
+        # sum[i] = 1, k[i] = 0 and sum[j] = k[j] for all j > i
+        for i in range(len(bits)):
+            if k >> i & 1:
+                continue
+            clause = [-bits[i]]
+            for j in range(i + 1, len(bits)):
+                clause.append(-bits[j] if k >> j & 1 else bits[j])
+            self._add_clause_const(clause)
+
+    def _full_adder(self, x, y, z):
+        s = self.var()
+        c = self.var()
+        # s = x ^ y ^ z
+        for vx, vy, vz in product(range(2), repeat=3):
+            self._add_clause_const([
+                -x if vx else x,
+                -y if vy else y,
+                -z if vz else z,
+                s if vx ^ vy ^ vz else -s,
+            ])
+        # c = maj(x, y, z)
+        for a, b in ((x, y), (x, z), (y, z)):
+            self._add_clause_const([-a, -b, c])
+            self._add_clause_const([a, b, -c])
+        return s, c
 
     # def SeqFloor(src, c):
     #     n = len(src)
@@ -299,51 +1134,281 @@ class Constraints:
         assert not mn
         self.add_clause(clause)
 
-    def constraint_convex(self, xs, lb=None, ub=None):
+    # bitmap antichain reduction is used up to this number of bits
+    CONVEX_MINIMIZE_BITS = 24
+
+    def constraint_convex(self, xs, lb=None, ub=None, minimize=False):
+        """
+        lb: points mx, removes all x <= mx (bitwise),
+        ub: points mn, removes all x >= mn (bitwise),
+        with xs[0] being the most significant bit.
+
+        minimize: reduce lb to its maximal and ub to its minimal points
+        first (clauses of dominated points are implied);
+        by a bitmap over all 2^len(xs) points up to CONVEX_MINIMIZE_BITS
+        bits, by pairwise comparison of the points beyond that
+        or without NumPy.
+        """
+        if has_numpy and len(xs) < 64:
+            if lb:
+                self._convex_bulk(xs, lb, True, minimize)
+            if ub:
+                self._convex_bulk(xs, ub, False, minimize)
+            return
+
+        # same clauses in the same order as _convex_bulk
         if lb:
+            lb = sorted(set(lb))
+            if minimize:
+                lb = self._convex_antichain_pairwise(lb, True)
             for mx in lb:
                 self.constraint_remove_lower(xs, mx)
         if ub:
+            ub = sorted(set(ub))
+            if minimize:
+                ub = self._convex_antichain_pairwise(ub, False)
             for mn in ub:
                 self.constraint_remove_upper(xs, mn)
 
-    def Convex(self, xs, m=None, lb=None, ub=None):
+    def _convex_bulk(self, xs, points, lower, minimize):
+        n = len(xs)
+        pts = np.unique(np.fromiter(points, dtype=np.uint64))
+        assert not (pts >> np.uint64(n)).any()
+        if minimize:
+            pts = self._convex_antichain(pts, n, lower)
+
+        # clause matrix: row per point, terminator column;
+        # least significant bit first, as in constraint_remove_*
+        shifts = np.arange(n, dtype=np.uint64)
+        lits = np.array(xs[::-1], dtype=np.int64)
+        if not lower:
+            lits = -lits
+        step = max(1, CHUNK // (n + 1))
+        for i in range(0, len(pts), step):
+            bits = (pts[i:i+step, None] >> shifts) & np.uint64(1)
+            keep = np.ones((len(bits), n + 1), dtype=bool)
+            keep[:, :n] = bits == (0 if lower else 1)
+            vals = np.zeros((len(bits), n + 1), dtype=np.int64)
+            vals[:, :n] = lits
+            self.add_clauses_flat(vals[keep].tolist())
+
+    def _convex_antichain(self, pts, n, lower):
+        """Maximal (lower=True) or minimal (lower=False) points."""
+        if n > self.CONVEX_MINIMIZE_BITS:
+            pts = self._convex_antichain_pairwise(pts.tolist(), lower)
+            return np.array(pts, dtype=np.uint64)
+        mask = np.uint64((1 << n) - 1)
+        if not lower:
+            pts = ~pts & mask
+
+        # down-closure bitmap by subset-sum style propagation
+        closure = np.zeros(1 << n, dtype=bool)
+        closure[pts] = True
+        for i in range(n):
+            view = closure.reshape(-1, 2, 1 << i)
+            view[:, 0, :] |= view[:, 1, :]
+
+        # dominated: some point above differs in one more bit
+        dominated = np.zeros(len(pts), dtype=bool)
+        for i in range(n):
+            b = np.uint64(1 << i)
+            dominated |= ((pts & b) == 0) & closure[pts | b]
+        pts = pts[~dominated]
+
+        if not lower:
+            pts = ~pts & mask
+        return pts
+
+    @staticmethod
+    def _convex_antichain_pairwise(pts, lower):
+        """
+        _convex_antichain for any number of bits, O(len(pts)^2):
+        points are taken by popcount, largest first for maximal points,
+        so that every dominated point comes after a point dominating it.
+        Keeps the order of pts.
+        """
+        kept = []
+        for p in sorted(pts, key=lambda p: bin(p).count("1"), reverse=lower):
+            # p is not below (lower) / above (upper) any kept point
+            if all(p & ~q if lower else q & ~p for q in kept):
+                kept.append(p)
+        kept = set(kept)
+        return [p for p in pts if p in kept]
+
+    def Convex(self, xs, m=None, lb=None, ub=None, minimize=False):
         if m is None:
             m = len(xs)
         ys = self.vars(m)
-        self.constraint_convex(Vector(xs).concat(ys), lb=lb, ub=ub)
+        self.constraint_convex(Vector(xs).concat(ys), lb=lb, ub=ub, minimize=minimize)
         return ys
 
-    def constraint_matching(S, u, v, mat, UB=True):
-        assert len(mat) == len(v)
-        assert len(mat[0]) == len(u)
-        e = [
-            [None] * len(u) for _ in range(len(v))
-        ]
+    def constraint_atmost(self, lits, k):
+        """At most k of lits are true."""
+        lits = list(lits)
+        if k >= len(lits):
+            return
+        if k < 0:
+            self.add_clause([self.ZERO])
+            return
+        card = self.Card(lits, limit=k + 1)
+        self.CardLEk(card, k)
+
+    def constraint_atleast(self, lits, k):
+        """At least k of lits are true."""
+        lits = list(lits)
+        self.constraint_atmost([-v for v in lits], len(lits) - k)
+
+    # "pairwise", "ladder", "commander", "product", "bimander" or "auto"
+    AMO_ENCODING = "auto"
+
+    def constraint_amo(self, lits, encoding=None):
+        """At most one of lits is true."""
+        lits = [v for v in lits if v != self.ZERO]
+        if len(lits) <= 1:
+            return
+        encoding = encoding or self.AMO_ENCODING
+        if encoding == "auto":
+            if len(lits) <= 6:
+                encoding = "pairwise"
+            elif len(lits) <= 64:
+                encoding = "ladder"
+            else:
+                encoding = "product"
+        method = getattr(self, f"_amo_{encoding}", None)
+        if method is None:
+            raise ValueError(f"unknown at-most-one encoding {encoding!r}")
+        method(lits)
+
+    def constraint_eo(self, lits, encoding=None):
+        """Exactly one of lits is true."""
+        self.add_clause(list(lits))
+        self.constraint_amo(lits, encoding=encoding)
+
+    def _amo_pairwise(self, lits):
+        for i, a in enumerate(lits):
+            for b in lits[i+1:]:
+                self.add_clause([-a, -b])
+
+    def _amo_ladder(self, lits):
+        # s_i: one of lits[:i+1] is true
+        prev = lits[0]
+        for x in lits[1:-1]:
+            s = self.var()
+            self.add_clause([-prev, s])
+            self.add_clause([-x, s])
+            self.add_clause([-prev, -x])
+            prev = s
+        self.add_clause([-prev, -lits[-1]])
+
+    def _amo_commander(self, lits, group=3):
+        while len(lits) > group + 1:
+            commanders = []
+            for i in range(0, len(lits), group):
+                sub = lits[i:i+group]
+                self._amo_pairwise(sub)
+                if len(sub) == 1:
+                    commanders.append(sub[0])
+                    continue
+                c = self.var()
+                for x in sub:
+                    self.add_clause([-x, c])
+                commanders.append(c)
+            lits = commanders
+        self._amo_pairwise(lits)
+
+    def _amo_product(self, lits):
+        if len(lits) <= 6:
+            self._amo_pairwise(lits)
+            return
+        q = int(len(lits) ** 0.5 + 0.999)
+        p = (len(lits) + q - 1) // q
+        rows = self.vars(p)
+        cols = self.vars(q)
+        for i, x in enumerate(lits):
+            self.add_clause([-x, rows[i // q]])
+            self.add_clause([-x, cols[i % q]])
+        self._amo_product(list(rows))
+        self._amo_product(list(cols))
+
+    def _amo_bimander(self, lits, group=2):
+        groups = [lits[i:i+group] for i in range(0, len(lits), group)]
+        nbits = (len(groups) - 1).bit_length()
+        bits = self.vars(nbits)
+        for j, sub in enumerate(groups):
+            self._amo_pairwise(sub)
+            for x in sub:
+                for k, b in enumerate(bits):
+                    self.add_clause([-x, b if j >> k & 1 else -b])
+
+    def constraint_matching(S, u, v, mat=None, UB=True, edges=None, csr=None):
+        """
+        Matching between u (sources) and v (targets):
+        every active u[x] is matched to exactly one v[y],
+        every v[y] takes at most one edge
+        (and, with UB, an active v[y] takes exactly one edge).
+
+        Allowed edges are given either by mat (dense len(v) x len(u)
+        0/1 matrix or a scipy.sparse matrix), by edges
+        (an iterable of (y, x) pairs), or by csr: a pair (indptr, indices)
+        with indptr of length len(v) + 1.
+
+        Returns the dict (y, x) -> edge variable.
+        """
+        assert (mat is not None) + (edges is not None) + (csr is not None) == 1
+        if csr is not None:
+            indptr, indices = csr
+            assert len(indptr) == len(v) + 1
+            edges = [
+                (y, x)
+                for y in range(len(v))
+                for x in indices[indptr[y]:indptr[y+1]]
+            ]
+        elif edges is None:
+            if hasattr(mat, "tocoo"):
+                coo = mat.tocoo()
+                assert coo.shape == (len(v), len(u))
+                edges = [
+                    (y, x) for y, x, w in zip(
+                        coo.row.tolist(), coo.col.tolist(), coo.data.tolist()
+                    ) if w
+                ]
+            else:
+                assert len(mat) == len(v)
+                assert len(mat[0]) == len(u)
+                edges = [
+                    (y, x)
+                    for y, row in enumerate(mat)
+                    for x, w in enumerate(row) if w
+                ]
+
+        e = {}
+        cols = [[] for _ in range(len(u))]
+        rows = [[] for _ in range(len(v))]
+        for y, x in edges:
+            y = int(y)
+            x = int(x)
+            if (y, x) in e:
+                continue
+            e[y, x] = exy = S.var()
+            # e_yx => v_y
+            # e_yx => u_x
+            S.add_clause([-exy, v[y]])
+            S.add_clause([-exy, u[x]])
+            cols[x].append(exy)
+            rows[y].append(exy)
 
-        for y in range(len(v)):
-            for x in range(len(u)):
-                if mat[y][x]:
-                    e[y][x] = S.var()
-                    # e_yx => v_y
-                    # e_yx => u_x
-                    S.add_clause([-e[y][x], v[y]])
-                    S.add_clause([-e[y][x], u[x]])
         # copy
-        for x in range(len(u)):
-            col = [e[y][x] for y in range(len(v)) if mat[y][x]]
-            card = S.Card(col, limit=2)
-            S.CardLEk(card, 1)
+        for x, col in enumerate(cols):
+            S.constraint_amo(col)
             # enforce outgoing
-            # u[x] => card >= 1
-            S.add_clause([-u[x], card[1]])
+            # u[x] => some edge
+            S.add_clause([-u[x]] + col)
 
         # xor
-        for y in range(len(v)):
-            row = [e[y][x] for x in range(len(u)) if mat[y][x]]
-            card = S.Card(row, limit=2)
-            S.CardLEk(card, 1)
+        for y, row in enumerate(rows):
+            S.constraint_amo(row)
             # enforce incoming (UB)
-            # v[y] => card >= 1
+            # v[y] => some edge
             if UB:
-                S.add_clause([-v[y], card[1]])
+                S.add_clause([-v[y]] + row)
+        return e
@@ -1,15 +1,34 @@
+import os
+import re
+import math
+import signal
+import asyncio
 import logging
+import threading
 import subprocess
 import shutil
 
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
 from .base import CNF
+from .formats import decode_model
+from .model import Model
+from .simple import Writer
 
 ARG_FLAGS = "<FLAGS>"
 ARG_DIMACS = "<DIMACS>"
 
 
 @CNF.register("ext")
-class ExtSolver(CNF):
+class ExtSolver(Writer):
+    """
+    External DIMACS solver.
+    Can be used as a CNF itself (the formula is kept by Writer)
+    or set as the solver of another Writer.
+    """
     BY_SOLVER = {}
 
     log = logging.getLogger(f"{__name__}:ExtSolver")
@@ -22,7 +41,25 @@ class ExtSolver(CNF):
                 subcls.log.debug(f"skipping ext solver {subcls.__name__} since command {subcls.CMD[0]} is not available")
                 subcls.AVAILABLE = False
 
-    def __init__(self, flags=(), solver=None, command=None):
+    # run the solver in its own session / process group
+    # (off in portfolio workers, which kill their whole group)
+    NEW_SESSION = True
+
+    # argument replacing ARG_DIMACS when piping DIMACS to stdin
+    # (None: drop the argument)
+    STDIN_ARG = None
+
+    def __init__(
+            self, flags=(), solver=None, command=None,
+            stdin=False, timeout=None, cpu_limit=None,
+            **opts):
+        """
+        stdin: pipe DIMACS to the solver instead of writing a file
+               (when solving through Writer.solve)
+        timeout: wall-clock limit in seconds
+        cpu_limit: CPU time limit in seconds (RLIMIT_CPU of the solver)
+        When a limit is hit, solve() returns None.
+        """
         if self.CMD is NotImplemented:
             if command is None:
                 raise ValueError("command was not passed to ExtSolver")
@@ -38,57 +75,193 @@ class ExtSolver(CNF):
             solver = f"ext/{self.CMD[0]}"
 
         self.flags = flags
+        self.stdin = stdin
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+
+        super().__init__(solver=solver, **opts)
+
+    def init_solver(self, solver):
+        super().init_solver(solver)
+        self._solver = self
+
+    def command(self, filename=None):
+        cmd = []
+        for v in self.CMD:
+            if v == ARG_FLAGS:
+                cmd.extend(self.flags)
+            elif v == ARG_DIMACS:
+                if filename is not None:
+                    cmd.append(filename)
+                elif self.STDIN_ARG is not None:
+                    cmd.append(self.STDIN_ARG)
+            else:
+                cmd.append(v)
+        return cmd
+
+    def _popen_opts(self):
+        opts = dict(stdout=subprocess.PIPE, start_new_session=self.NEW_SESSION)
+        if self.cpu_limit is not None:
+            if resource is None:
+                raise NotImplementedError("cpu_limit is not supported here")
+            limit = int(math.ceil(self.cpu_limit))
 
-        super().__init__(solver=solver)
+            def set_limits():
+                resource.setrlimit(resource.RLIMIT_CPU, (limit, limit + 1))
 
-    def solve_file(self, filename, log=True):
-        cmd = [filename if v == ARG_DIMACS else v for v in self.CMD]
-        pos = cmd.index(ARG_FLAGS)
-        cmd[pos:pos+1] = list(self.flags)
+            opts["preexec_fn"] = set_limits
+        return opts
+
+    def _kill(self, pid):
+        try:
+            if self.NEW_SESSION:
+                os.killpg(pid, signal.SIGKILL)
+            else:
+                os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def solve_file(self, filename, log=True, timeout=None):
+        return self._run(self.command(filename), None, log, timeout)
+
+    def solve_stream(self, chunks, log=True, timeout=None):
+        """Solve DIMACS given by bytes chunks, piped to the solver's stdin."""
+        return self._run(self.command(), chunks, log, timeout)
+
+    def _run(self, cmd, chunks, log, timeout):
+        if timeout is None:
+            timeout = self.timeout
 
-        # self.log.info(f"command {cmd}")
         p = subprocess.Popen(
             cmd,
-            stdout=subprocess.PIPE,
-            # stderr=subprocess.PIPE,
+            stdin=subprocess.DEVNULL if chunks is None else subprocess.PIPE,
+            **self._popen_opts(),
         )
-        ret = None
-        sol = []
-        while True:
-            line = p.stdout.readline()
-            if not line:
-                break
-            if not line.strip():
-                continue
-
-            if log:
-                self.log.debug(line)
-                # print(line)
-
-            if line[:1] == b"s":
-                res = line.split()[1]
-                if res == b"SATISFIABLE":
-                    # self.log.info("SAT")
-                    ret = True
-                elif res == b"UNSATISFIABLE":
-                    # self.log.info("UNSAT")
-                    ret = False
-                else:
-                    raise RuntimeError(f"unknown status {res}")
-            elif line[:1] == b"v":
-                sol.extend(map(int, line[1:].split()))
-            elif line[:1] == b"c":
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            self._kill(p.pid)
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, on_timeout)
+            timer.start()
+        if chunks is not None:
+            threading.Thread(
+                target=self._feed, args=(p.stdin, chunks), daemon=True,
+            ).start()
+
+        try:
+            out = p.stdout.read()
+            p.wait()
+        except BaseException:
+            self._kill(p.pid)
+            p.wait()
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            p.stdout.close()
+
+        if timed_out.is_set():
+            self.log.info(f"solver timed out after {timeout}s")
+            return None
+        return self._result(out, p.returncode, log)
+
+    @staticmethod
+    def _feed(f, chunks):
+        try:
+            for chunk in chunks:
+                f.write(chunk)
+            f.close()
+        except (BrokenPipeError, ValueError):
+            # solver exited early
+            pass
+
+    async def solve_file_async(self, filename, log=True, timeout=None):
+        return await self._run_async(self.command(filename), None, log, timeout)
+
+    async def solve_stream_async(self, chunks, log=True, timeout=None):
+        """
+        Coroutine version of solve_stream().
+        On cancellation, the solver process group is killed.
+        """
+        return await self._run_async(self.command(), chunks, log, timeout)
+
+    async def _run_async(self, cmd, chunks, log, timeout):
+        if timeout is None:
+            timeout = self.timeout
+
+        p = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=subprocess.DEVNULL if chunks is None else subprocess.PIPE,
+            **self._popen_opts(),
+        )
+
+        async def feed():
+            if chunks is None:
+                return
+            try:
+                for chunk in chunks:
+                    p.stdin.write(chunk)
+                    await p.stdin.drain()
+                p.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
                 pass
+
+        async def run():
+            out, _ = await asyncio.gather(p.stdout.read(), feed())
+            await p.wait()
+            return out
+
+        try:
+            out = await asyncio.wait_for(run(), timeout)
+        except asyncio.TimeoutError:
+            self._kill(p.pid)
+            await p.wait()
+            self.log.info(f"solver timed out after {timeout}s")
+            return None
+        except BaseException:
+            self._kill(p.pid)
+            await p.wait()
+            raise
+        return self._result(out, p.returncode, log)
+
+    # solver output is parsed in bulk: status and "v" lines are picked
+    # by regular expressions, the model is decoded by formats.decode_model
+    _RE_STATUS = re.compile(rb"^s[ \t]+(\S+)", re.M)
+    _RE_VALUES = re.compile(rb"^v(.*)$", re.M)
+    _RE_UNKNOWN = re.compile(rb"^(?![svc]).*\S.*$", re.M)
+
+    def _result(self, out, returncode, log):
+        if log and self.log.isEnabledFor(logging.DEBUG):
+            for line in out.splitlines():
+                if line.strip():
+                    self.log.debug(line)
+
+        for line in self._RE_UNKNOWN.findall(out):
+            self.log.warning(f"unknown line type {line[:1]}: {line} ")
+
+        ret = None
+        for res in self._RE_STATUS.findall(out):
+            if res == b"SATISFIABLE":
+                ret = True
+            elif res == b"UNSATISFIABLE":
+                ret = False
+            elif res == b"UNKNOWN":
+                return None
             else:
-                self.log.warning(f"unknown line type {line[:1]}: {line} ")
+                raise RuntimeError(f"unknown status {res}")
 
         if ret is None:
+            if self.cpu_limit is not None and returncode < 0:
+                self.log.info(f"solver killed by signal {-returncode}")
+                return None
             raise RuntimeError("Solver did not solve")
-        # self.log.debug(f"ret {ret} sol {sol}")
         if ret is True:
-            assert len(set(map(abs, sol))) == len(sol)
-            assert ret is True
-            return {abs(v): int(v > 0) for v in sol}
+            data = b" ".join(self._RE_VALUES.findall(out))
+            return Model(decode_model(data, self.n_vars))
         return False
 
 
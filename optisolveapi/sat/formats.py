@@ -0,0 +1,345 @@
+"""
+Clause serialization.
+
+Clauses are passed around as flat integer arrays where every clause
+is terminated by 0 (exactly as in the DIMACS body):
+
+    [1, -2, 0, 3, 0]  ~  [[1, -2], [3]]
+"""
+
+import re
+import sys
+import bz2
+import gzip
+import lzma
+import mmap
+import struct
+
+from array import array
+
+try:
+    import numpy as np
+    has_numpy = True
+except ImportError:
+    has_numpy = False
+
+CHUNK = 1 << 20
+
+_MINUS = ord("-")
+_SPACE = ord(" ")
+_NEWLINE = ord("\n")
+_DIGIT0 = ord("0")
+
+
+def flatten_clauses(cs):
+    lits = []
+    for c in cs:
+        lits.extend(c)
+        lits.append(0)
+    return lits
+
+
+def split_clauses(lits):
+    """Inverse of flatten_clauses()."""
+    if has_numpy and (len(lits) > 256 or isinstance(lits, np.ndarray)):
+        lits = np.asarray(lits)
+        ends = np.flatnonzero(lits == 0)
+        sizes = np.diff(ends, prepend=-1) - 1
+        starts = ends - sizes
+        # clauses of the same size are cut out as one 2D block
+        # (rows converted by a single tolist())
+        res = [None] * len(ends)
+        for size in np.unique(sizes).tolist():
+            idx = np.flatnonzero(sizes == size)
+            block = lits[starts[idx, None] + np.arange(size)]
+            for i, c in zip(idx.tolist(), block.tolist()):
+                res[i] = c
+        return res
+
+    res = []
+    c = []
+    for v in lits:
+        if v:
+            c.append(v)
+        else:
+            res.append(c)
+            c = []
+    assert not c, "missing clause terminator"
+    return res
+
+
+def count_clauses(lits):
+    if has_numpy and len(lits) > 256:
+        return int(np.count_nonzero(np.asarray(lits) == 0))
+    return list(lits).count(0)
+
+
+def _encode_clauses_python(lits):
+    return b"".join(b"%d " % v if v else b"0\n" for v in lits)
+
+
+def _encode_clauses_numpy(lits):
+    a = np.asarray(lits, dtype=np.int64)
+    if not len(a):
+        return b""
+    neg = a < 0
+    a = np.abs(a).astype(np.uint32)
+
+    ndigits = np.ones(len(a), dtype=np.uint8)
+    p = 10
+    while True:
+        more = a >= p
+        if not more.any():
+            break
+        ndigits += more
+        p *= 10
+    width = int(ndigits.max())
+
+    # fixed-width tokens: [pad][-][digits][" " or "\n"] with digits
+    # right-aligned, padding is masked out at the end;
+    # stored transposed so that every position is a contiguous row
+    tokens = np.empty((width + 2, len(a)), dtype=np.uint8)
+    tokens[-1] = np.where(a == 0, _NEWLINE, _SPACE)
+    tokens[0] = _MINUS
+    for k in range(width):
+        a, digit = np.divmod(a, 10)
+        tokens[width - k] = np.where(ndigits > k, digit + _DIGIT0, _MINUS)
+    first = (width + 1 - ndigits) - neg
+    keep = np.arange(width + 2, dtype=np.uint8)[:, None] >= first
+    return tokens.T[keep.T].tobytes()
+
+
+def encode_clauses(lits):
+    """DIMACS body (bytes) of a flat 0-terminated literal array."""
+    if has_numpy and len(lits) > 64:
+        return _encode_clauses_numpy(lits)
+    return _encode_clauses_python(lits)
+
+
+def write_clauses(f, lits):
+    for i in range(0, len(lits), CHUNK):
+        f.write(encode_clauses(lits[i:i+CHUNK]))
+
+
+def write_header(f, n_vars, n_clauses):
+    f.write(b"p cnf %d %d\n" % (n_vars, n_clauses))
+
+
+def _decode_model_python(data, n_vars):
+    lits = [int(v) for v in data.split()]
+    size = max([n_vars] + [abs(v) for v in lits]) + 1
+    model = bytearray(size)
+    seen = bytearray(size)
+    for v in lits:
+        assert not seen[abs(v)] or not v, f"variable {abs(v)} set twice"
+        seen[abs(v)] = 1
+        model[abs(v)] = v > 0
+    return model
+
+
+def _decode_model_numpy(data, n_vars):
+    lits = np.fromstring(data, dtype=np.int64, sep=" ")
+    lits = lits[lits != 0]
+    var = np.abs(lits)
+    size = max(n_vars, int(var.max()) if len(var) else 0) + 1
+    assert np.bincount(var, minlength=size).max(initial=0) <= 1, \
+        "variable set twice"
+    model = np.zeros(size, dtype=np.uint8)
+    model[var] = lits > 0
+    return bytearray(model.tobytes())
+
+
+def decode_model(data, n_vars=0):
+    """
+    Model from the payload of solver's "v" lines (bytes, "v" removed),
+    as a bytearray indexed by variable (unassigned variables are 0).
+    """
+    if has_numpy and len(data) > 256:
+        return _decode_model_numpy(data, n_vars)
+    return _decode_model_python(data, n_vars)
+
+
+_OPENERS = {
+    ".gz": gzip.open,
+    ".xz": lzma.open,
+    ".bz2": bz2.open,
+}
+# compression options for writing: the defaults (gzip 9, xz 6)
+# are several times slower than these for a few % smaller DIMACS files
+COMPRESS_OPTIONS = {
+    ".gz": dict(compresslevel=3),
+    ".xz": dict(preset=1),
+    ".bz2": dict(),
+}
+
+
+def open_file(path, mode="rb"):
+    """open() with transparent .gz/.xz/.bz2 (de)compression."""
+    for ext, opener in _OPENERS.items():
+        if str(path).endswith(ext):
+            if "w" in mode:
+                return opener(path, mode, **COMPRESS_OPTIONS[ext])
+            return opener(path, mode)
+    return open(path, mode)
+
+
+_RE_HEADER = re.compile(rb"^p\s+cnf\s+(\d+)\s+(\d+)", re.M)
+_RE_COMMENT = re.compile(rb"^[cp].*$", re.M)
+_RE_END = re.compile(rb"^%", re.M)
+
+
+def _read_chunks(path):
+    if str(path).endswith(tuple(_OPENERS)):
+        with open_file(path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
+            return
+        with mm:
+            for i in range(0, len(mm), CHUNK):
+                yield mm[i:i+CHUNK]
+
+
+def _parse_ints(data):
+    if b"c" in data or b"p" in data:
+        data = _RE_COMMENT.sub(b"", data)
+    if has_numpy:
+        if not data or data.isspace():
+            # np.fromstring gives [0] for blank input
+            return np.zeros(0, dtype=np.int64)
+        return np.fromstring(data, dtype=np.int64, sep=" ")
+    return [int(v) for v in data.split()]
+
+
+def parse_clauses(data):
+    """Flat 0-terminated literal array of a DIMACS body (bytes)."""
+    return _parse_ints(data)
+
+
+def _split_complete(lits):
+    """(complete clauses, incomplete clause at the end)"""
+    if has_numpy:
+        ends = np.flatnonzero(lits == 0)
+        end = int(ends[-1]) + 1 if len(ends) else 0
+    else:
+        end = len(lits)
+        while end and lits[end - 1] != 0:
+            end -= 1
+    return lits[:end], lits[end:]
+
+
+def _read_header(chunks):
+    """Header (or None) and the data read so far."""
+    data = b""
+    pos = 0
+    for chunk in chunks:
+        data += chunk
+        while True:
+            end = data.find(b"\n", pos)
+            if end < 0:
+                break
+            if data[pos:pos+1] != b"c":
+                m = _RE_HEADER.match(data, pos)
+                return (int(m.group(1)), int(m.group(2))) if m else None, data
+            pos = end + 1
+    m = _RE_HEADER.match(data, pos)
+    return (int(m.group(1)), int(m.group(2))) if m else None, data
+
+
+def read_dimacs(path):
+    """
+    Read a DIMACS CNF file (plain, .gz, .xz or .bz2).
+    Yields the header (n_vars, n_clauses) first (None if there is none),
+    then flat 0-terminated literal arrays of complete clauses
+    (NumPy arrays when NumPy is available).
+    """
+    chunks = _read_chunks(path)
+    header, rest = _read_header(chunks)
+    yield header
+
+    tail = _parse_ints(b"")
+    for chunk in chunks:
+        chunk = rest + chunk
+        # SATLIB end marker
+        m = b"%" in chunk and _RE_END.search(chunk)
+        if m:
+            rest = chunk[:m.start()]
+            break
+
+        cut = chunk.rfind(b"\n") + 1
+        chunk, rest = chunk[:cut], chunk[cut:]
+        lits, tail = _split_complete(_concat(tail, _parse_ints(chunk)))
+        if len(lits):
+            yield lits
+    else:
+        m = b"%" in rest and _RE_END.search(rest)
+        if m:
+            rest = rest[:m.start()]
+
+    lits = _concat(tail, _parse_ints(rest))
+    if len(lits):
+        assert lits[-1] == 0, "missing clause terminator"
+        yield lits
+
+
+def _concat(a, b):
+    if not len(a):
+        return b
+    if has_numpy:
+        return np.concatenate([a, b])
+    return a + b
+
+
+# Binary CNF: header, int32 literals (0-terminated clauses, as in Formula),
+# int64 clause offsets (n_clauses + 1 entries), all little-endian.
+BINARY_MAGIC = b"OSACNF01"
+_BINARY_HEADER = struct.Struct("<8sqqq")  # magic, n_vars, n_clauses, n_lits
+
+
+def write_binary(f, n_vars, lits, offsets):
+    assert len(offsets) >= 1 and offsets[-1] == len(lits)
+    f.write(_BINARY_HEADER.pack(BINARY_MAGIC, n_vars, len(offsets) - 1, len(lits)))
+    for data, dtype, code in ((lits, "<i4", "i"), (offsets, "<i8", "q")):
+        if has_numpy:
+            f.write(np.asarray(data).astype(dtype, copy=False).tobytes())
+            continue
+        data = array(code, data)
+        if sys.byteorder != "little":
+            data.byteswap()
+        f.write(data.tobytes())
+
+
+def read_binary(path):
+    """
+    (n_vars, lits, offsets) of a binary CNF file.
+    With NumPy, the arrays are read-only views of the mmap'ed file.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, n_vars, n_clauses, n_lits = _BINARY_HEADER.unpack_from(mm)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{path} is not a binary CNF file")
+    pos = _BINARY_HEADER.size
+    if has_numpy:
+        lits = np.frombuffer(mm, dtype="<i4", count=n_lits, offset=pos)
+        offsets = np.frombuffer(
+            mm, dtype="<i8", count=n_clauses + 1, offset=pos + 4 * n_lits
+        )
+        return n_vars, lits, offsets
+
+    lits = array("i", mm[pos:pos + 4 * n_lits])
+    pos += 4 * n_lits
+    offsets = array("q", mm[pos:pos + 8 * (n_clauses + 1)])
+    mm.close()
+    if sys.byteorder != "little":
+        lits.byteswap()
+        offsets.byteswap()
+    return n_vars, lits, offsets
@@ -0,0 +1,92 @@
+"""
+Compact SAT models.
+
+A model is stored as one byte per variable (index = variable, 0/1),
+in a NumPy uint8 array when NumPy is available and in a bytearray otherwise.
+Model is a read-only Mapping, so that sol[v] works as with dict solutions.
+"""
+from collections.abc import Mapping
+
+try:
+    import numpy as np
+    has_numpy = True
+except ImportError:
+    has_numpy = False
+
+
+class Model(Mapping):
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        """values[v] is the value of variable v, values[0] is ignored."""
+        if has_numpy:
+            if isinstance(values, (bytes, bytearray)):
+                values = np.frombuffer(values, dtype=np.uint8)
+            else:
+                values = np.asarray(values, dtype=np.uint8)
+        else:
+            values = bytearray(values)
+        self.values = values
+
+    @classmethod
+    def from_pysat(cls, model, n_vars=0):
+        """From a list of signed literals; missing variables are set to 0."""
+        if has_numpy:
+            lits = np.asarray(model, dtype=np.int64)
+            size = max(n_vars, int(np.abs(lits).max()) if len(lits) else 0)
+            values = np.zeros(size + 1, dtype=np.uint8)
+            values[np.abs(lits)] = lits > 0
+            return cls(values)
+
+        size = max([n_vars] + [abs(v) for v in model])
+        values = bytearray(size + 1)
+        for v in model:
+            values[abs(v)] = v > 0
+        return cls(values)
+
+    def to_pysat(self):
+        """Signed literal list (as returned by PySAT's get_model())."""
+        if has_numpy:
+            vs = np.arange(1, len(self.values), dtype=np.int64)
+            return np.where(self.values[1:], vs, -vs).tolist()
+        return [v if self.values[v] else -v for v in range(1, len(self.values))]
+
+    def eval(self, lits):
+        """Tuple of values of the literals (0 literals are skipped)."""
+        if has_numpy and len(lits) > 16:
+            lits = np.asarray(lits, dtype=np.int64)
+            lits = lits[lits != 0]
+            return tuple((self.values[np.abs(lits)] ^ (lits < 0)).tolist())
+        return tuple(int(self.values[abs(v)]) ^ (v < 0) for v in lits if v)
+
+    def eval_many(self, vecs):
+        """List of eval(vec) for a sequence of vectors, evaluated at once."""
+        vecs = [[v for v in vec if v] for vec in vecs]
+        flat = self.eval([v for vec in vecs for v in vec])
+        res = []
+        pos = 0
+        for vec in vecs:
+            res.append(flat[pos:pos+len(vec)])
+            pos += len(vec)
+        return res
+
+    def copy(self):
+        return type(self)(self.values.copy())
+
+    def __getitem__(self, v):
+        if not 0 < v < len(self.values):
+            raise KeyError(v)
+        return int(self.values[v])
+
+    def __len__(self):
+        return len(self.values) - 1
+
+    def __iter__(self):
+        return iter(range(1, len(self.values)))
+
+    def __bool__(self):
+        # a model is always a truthy solve() result (unlike False / None)
+        return True
+
+    def __repr__(self):
+        return f"<Model n_vars={len(self)}>"
@@ -0,0 +1,116 @@
+import os
+import signal
+import logging
+import multiprocessing
+from queue import Empty
+
+from .base import CNF
+from .simple import Formula
+from .ext import ExtSolver
+
+
+def _worker(queue, index, solver, n_vars, lits, assumptions):
+    # own process group, external solvers started by this worker stay in it,
+    # so that one SIGKILL to the group stops everything
+    # (a solver inside C code would not react to SIGTERM anyway)
+    os.setpgrp()
+    ExtSolver.NEW_SESSION = False
+    try:
+        S = CNF.new(solver=solver)
+        S.n_vars = n_vars
+        S.add_clauses_flat(lits)
+        queue.put((index, S.solve(assumptions=assumptions), None))
+    except Exception as err:
+        queue.put((index, None, f"{type(err).__name__}: {err}"))
+
+
+@CNF.register("portfolio")
+class Portfolio(Formula):
+    """
+    Runs several solvers in separate processes on the same formula,
+    the first answer wins, the other solvers are killed.
+
+    Clauses are stored as in Formula and replayed into each solver
+    (any registered CNF solver, including ext/ ones) on solve().
+    """
+    log = logging.getLogger(f"{__name__}:Portfolio")
+
+    SOLVERS = (
+        "pysat/cadical195",
+        "pysat/glucose4",
+        "pysat/maplechrono",
+        "ext/kissat",
+    )
+
+    def __init__(self, solver="portfolio", solvers=None):
+        if solvers is None:
+            solvers = [name for name in self.SOLVERS if name in CNF.BY_SOLVER]
+        if not solvers:
+            raise ValueError("no solvers for the portfolio")
+        self.solvers = list(solvers)
+        self.winner = None
+        super().__init__(solver=solver)
+
+    def solve(self, assumptions=()):
+        self.flush()
+        queue = multiprocessing.Queue()
+        lits = self.clauses[1:].lits
+        procs = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(queue, i, name, self.n_vars, lits, list(assumptions)),
+                daemon=True,
+            )
+            for i, name in enumerate(self.solvers)
+        ]
+        for p in procs:
+            p.start()
+
+        try:
+            errors = {}
+            while len(errors) < len(procs):
+                # a worker's result is in the queue before it exits,
+                # so workers dead before an empty get() died without a result
+                dead = [
+                    i for i, p in enumerate(procs)
+                    if i not in errors and p.exitcode is not None
+                ]
+                try:
+                    index, sol, err = queue.get(timeout=self.POLL_INTERVAL)
+                except Empty:
+                    for i in dead:
+                        err = f"worker exited with code {procs[i].exitcode}"
+                        self.log.warning(f"solver {self.solvers[i]} failed: {err}")
+                        errors[i] = err
+                    continue
+                if err is None:
+                    break
+                self.log.warning(f"solver {self.solvers[index]} failed: {err}")
+                errors[index] = err
+            else:
+                raise RuntimeError(
+                    f"all portfolio solvers failed: {list(errors.values())}"
+                )
+        finally:
+            self._kill(procs)
+
+        self.winner = self.solvers[index]
+        self.log.info(f"solved by {self.winner}")
+        return sol
+
+    # seconds between checks for workers that died without a result
+    POLL_INTERVAL = 0.5
+
+    @staticmethod
+    def _kill(procs):
+        # all workers are killed first, then joined
+        for p in procs:
+            if not p.is_alive():
+                continue
+            try:
+                os.killpg(p.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                # not in its own group yet
+                p.kill()
+        for p in procs:
+            p.join()
@@ -1,5 +1,4 @@
 import logging
-from itertools import product
 
 try:
     from pysat.solvers import Solver, SolverNames
@@ -8,6 +7,7 @@ except ImportError:
     has_pysat = False
 
 from .base import CNF
+from .model import Model
 
 if has_pysat:
     class PySAT(CNF):
@@ -17,48 +17,79 @@ if has_pysat:
             if not has_pysat:
                 raise ImportError("PySAT not found")
             assert solver.startswith("pysat/")
-            pysat_solver = solver[len("pysat/"):]
-            self._solver = Solver(name=pysat_solver)
-
             super().__init__(solver=solver)
 
+        def init_solver(self, solver):
+            self._solver = Solver(name=solver[len("pysat/"):])
+            # native at-most-k constraints (minicard, gluecard)
+            self.native_card = bool(self._solver.supports_atmost())
+
         def model_to_sol(self, model):
-            res = {(i+1): int(v > 0) for i, v in enumerate(model)}
             added = self.n_vars - len(model)
-            for i in range(len(model), self.n_vars):
-                assert (i+1) not in res
-                res[i+1] = 0
-            if added:
+            if added > 0:
                 self.log.debug(f"set {added} free vars to 0")
-            return res
-
-        def model_to_sols(self, model):
-            res = {(i+1): int(v > 0) for i, v in enumerate(model)}
-            if self.n_vars > len(res):
-                for vals in product(range(2), repeat=self.n_vars - len(model)):
-                    for i, v in zip(range(len(model), self.n_vars), vals):
-                        res[i+1] = v
-                    yield res.copy()
+            return Model.from_pysat(model, self.n_vars)
+
+        def _flush_pending(self):
+            # append_formula() checks every clause for a native
+            # cardinality constraint, clauses are passed directly
+            if self._pending:
+                pending, self._pending = self._pending, []
+                add_clause = self._solver.add_clause
+                for c in pending:
+                    add_clause(c)
+
+        def constraint_atmost(self, lits, k):
+            lits = list(lits)
+            # native constraints are not in the clause log
+            if self.native_card and self._log is None and 0 <= k < len(lits):
+                self.n_clauses += 1
+                self._solver.add_atmost(lits, k)
+            else:
+                super().constraint_atmost(lits, k)
+
+        def constraint_amo(self, lits, encoding=None):
+            if self.native_card and encoding is None:
+                self.constraint_atmost(lits, 1)
             else:
-                yield res
+                super().constraint_amo(lits, encoding=encoding)
 
         def solve(self, assumptions=()):
+            self.flush()
             sol = self._solver.solve(assumptions=assumptions)
             if sol is None or sol is False:
                 return False
             model = self._solver.get_model()
             return self.model_to_sol(model)
 
-        def solve_all(self, assumptions=()):
-            sol = self._solver.solve(assumptions=assumptions)
-            if sol is None or sol is False:
-                return
-            for model in self._solver.enum_models():
-                yield from self.model_to_sols(model)
-            # pysat spoils the model after enum_models() ...
-            # clear up to ensure no surprises
-            self._solver.delete()
-            del self._solver
+        def get_core(self):
+            return self._solver.get_core()
+
+        def solve_all(self, assumptions=(), project=None):
+            """
+            Enumerate models with distinct assignments of the variables
+            in project (all variables by default).
+
+            Blocking clauses are guarded by a fresh activation variable,
+            which is disabled afterwards, so the solver stays usable.
+            """
+            if project is None:
+                project = range(2, self.n_vars + 1)
+            project = [abs(v) for v in project]
+
+            act = self.var()
+            assumptions = list(assumptions) + [act]
+            try:
+                while True:
+                    self.flush()
+                    if not self._solver.solve(assumptions=assumptions):
+                        break
+                    sol = self.model_to_sol(self._solver.get_model())
+                    yield sol
+                    block = self.make_assumption(project, sol.eval(project))
+                    self.add_clause([-act] + [-v for v in block])
+            finally:
+                self.add_clause([-act])
 
         def __del__(self):
             if hasattr(self, "_solver") and self._solver:
@@ -1,72 +1,360 @@
 from io import BytesIO
+from array import array
 from copy import deepcopy
 from tempfile import NamedTemporaryFile
 
 from .base import CNF
+from .formats import (
+    has_numpy, CHUNK,
+    flatten_clauses, count_clauses, write_clauses, write_header,
+    open_file, write_binary, parse_clauses,
+)
+
+if has_numpy:
+    import numpy as np
+
+
+class Clauses:
+    """Read-only list-like view of the clauses stored in a Formula."""
+
+    def __init__(self, lits, offsets, start=0, stop=None):
+        self._lits = lits
+        self._offsets = offsets
+        self.start = start
+        self.stop = len(offsets) - 1 if stop is None else stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            assert step == 1, "only contiguous slices are supported"
+            return Clauses(
+                self._lits, self._offsets,
+                self.start + start, self.start + max(start, stop),
+            )
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("clause index out of range")
+        i += self.start
+        return self._lits[self._offsets[i]:self._offsets[i+1]-1].tolist()
+
+    def __iter__(self):
+        lits = self._lits
+        offsets = self._offsets
+        for i in range(self.start, self.stop):
+            yield lits[offsets[i]:offsets[i+1]-1].tolist()
+
+    @property
+    def lits(self):
+        """Flat 0-terminated literals of the viewed clauses."""
+        return self._lits[self._offsets[self.start]:self._offsets[self.stop]]
+
+
+class Template:
+    """
+    Formula compiled for fast repeated instantiation (see CNF.apply).
+
+    Variable 1 of the formula is ZERO, the next n_inputs variables
+    are the inputs and the remaining ones are auxiliary.
+    Every literal of the clause array is stored as a slot of the table
+    [0, ZERO, inputs..., auxiliary...] together with its sign,
+    so that a copy is one lookup into the table filled with the given
+    inputs and fresh auxiliary variables.
+    """
+
+    def __init__(self, formula, n_inputs=None):
+        # collected XOR equations become clauses
+        formula.flush()
+        assert formula.clauses[0] == [-formula.ZERO] == [-1]
+        if n_inputs is None:
+            n_inputs = formula.n_vars - 1
+        assert 0 <= n_inputs <= formula.n_vars - 1
+        self.n_inputs = n_inputs
+        self.n_aux = formula.n_vars - 1 - n_inputs
+        self.n_clauses = formula.n_clauses - 1
+        self.lits = formula.clauses[1:].lits
+        if has_numpy:
+            lits = np.array(self.lits, dtype=np.int64)
+            self.slots = np.abs(lits)
+            self.signs = np.sign(lits)
+
+    def instantiate(self, cnf, inp):
+        """Add a copy to cnf, returns its auxiliary variables."""
+        return self.instantiate_many(cnf, [inp])[0]
+
+    def instantiate_many(self, cnf, inps):
+        """Add a copy per input vector, returns their auxiliary variables."""
+        inps = [list(inp) for inp in inps]
+        assert all(len(inp) == self.n_inputs for inp in inps)
+        m = len(inps)
+        first = cnf.n_vars + 1
+        cnf.n_vars += m * self.n_aux
+        aux = [
+            list(range(first + j * self.n_aux, first + (j + 1) * self.n_aux))
+            for j in range(m)
+        ]
+        if not m or not self.n_clauses:
+            return aux
+
+        if has_numpy:
+            n, k = self.n_inputs, self.n_aux
+            table = np.zeros((m, 2 + n + k), dtype=np.int64)
+            table[:, 1] = cnf.ZERO
+            table[:, 2:2 + n] = np.array(inps, dtype=np.int64).reshape(m, n)
+            table[:, 2 + n:] = first + np.arange(m * k).reshape(m, k)
+            cnf.add_clauses_flat((table[:, self.slots] * self.signs).ravel())
+        else:
+            lits = []
+            for inp, vs in zip(inps, aux):
+                table = [0, cnf.ZERO] + inp + vs
+                lits.extend(table[i] if i >= 0 else -table[-i] for i in self.lits)
+            cnf.add_clauses_flat(lits)
+        return aux
 
 
 @CNF.register("formula")
 class Formula(CNF):
+    """
+    Plain clause storage.
+
+    Clauses are kept in a flat 0-terminated array('i') of literals
+    (the DIMACS body layout) together with the clause offset index,
+    i.e. about 4 bytes per literal.
+    """
+    BULK_CLAUSES = True
+    BACKEND_STATE = ("_lits", "_offsets")
+
+    def __init__(self, solver="formula"):
+        super().__init__(solver=solver)
+
     def init_solver(self, solver=None):
-        self.clauses = []
+        self._lits = array("i")
+        self._offsets = array("q", [0])
+
+    @property
+    def clauses(self):
+        return Clauses(self._lits, self._offsets)
+
+    def __iter__(self):
+        return iter(self.clauses)
 
     def add_clause(self, c):
         self.n_clauses += 1
-        self.clauses.append(c)
+        self._lits.extend(c)
+        self._lits.append(0)
+        self._offsets.append(len(self._lits))
 
     def add_clauses(self, cs):
-        self.n_clauses += len(cs)
-        self.clauses.extend(cs)
+        self.add_clauses_flat(flatten_clauses(cs))
+
+    def add_clauses_flat(self, lits):
+        if not len(lits):
+            return
+        assert lits[-1] == 0, "missing clause terminator"
+        base = len(self._lits)
+        if has_numpy and isinstance(lits, np.ndarray):
+            self._lits.frombytes(lits.astype(np.int32, copy=False).tobytes())
+        else:
+            self._lits.extend(lits)
+        if has_numpy:
+            if not isinstance(lits, np.ndarray):
+                lits = np.frombuffer(self._lits, dtype=np.int32)[base:]
+            ends = np.flatnonzero(lits == 0) + (base + 1)
+            self._offsets.frombytes(ends.astype(np.int64).tobytes())
+            del lits
+        else:
+            self._offsets.extend(
+                base + i + 1 for i, v in enumerate(lits) if v == 0
+            )
+        self.n_clauses = len(self._offsets) - 1
 
     def write_dimacs(self, filename, assumptions=(), extra_clauses=()):
-        clauses = self.clauses
-        if assumptions or extra_clauses:
-            clauses = self.clauses.copy()
-            if assumptions:
-                for v in assumptions:
-                    clauses.append([v])
-            if extra_clauses:
-                clauses.extend(extra_clauses)
-        # clauses.to_file(filename)
-        raise NotImplementedError()
+        """Write DIMACS (compressed if filename ends with .gz/.xz/.bz2)."""
+        self.flush()
+        with open_file(filename, "wb") as f:
+            n_clauses = self.n_clauses + len(assumptions) + len(extra_clauses)
+            write_header(f, self.n_vars, n_clauses)
+            write_clauses(f, self._lits)
+            write_clauses(f, flatten_clauses([v] for v in assumptions))
+            write_clauses(f, flatten_clauses(extra_clauses))
+
+    def write_binary(self, filename):
+        """Write the binary CNF format (see CNF.from_binary)."""
+        self.flush()
+        with open(filename, "wb") as f:
+            write_binary(f, self.n_vars, self._lits, self._offsets)
+
+    def copy(self):
+        # arrays are deep-copied in bulk
+        return deepcopy(self)
+
+    def start_clause_log(self):
+        pass
+
+    @property
+    def clause_log(self):
+        return self._lits
+
+    def compile(self, n_inputs=None):
+        """
+        Template for repeated CNF.apply / CNF.apply_many,
+        by default all variables are inputs.
+        """
+        return Template(self, n_inputs)
 
 
 @CNF.register("writer")
 class Writer(CNF):
+    """
+    Writes DIMACS body on the fly.
+
+    By default the body is kept in memory. If backing_file is given,
+    or the body grows over spill_threshold bytes, it is streamed into a
+    file instead (a temporary one if backing_file is not given).
+    The file starts with a reserved header region, so that solve()
+    rewrites only the header and the assumptions tail in place.
+    """
+    HEADER_SIZE = 64
+    BULK_CLAUSES = True
+    BACKEND_STATE = ("_file", "_spilled")
+
+    def __init__(self, solver="writer", backing_file=None, spill_threshold=None):
+        self._backing_file = backing_file
+        self._spill_threshold = spill_threshold
+        super().__init__(solver=solver)
+
     def init_solver(self, solver):
         self._file = BytesIO()
+        self._spilled = False
         self._solver = None
+        if self._backing_file is not None:
+            self._spill()
 
     def add_clause(self, c):
         self.n_clauses += 1
         self._file.write(b" ".join(b"%d" % v for v in c))
         self._file.write(b" 0\n")
+        self._check_spill()
 
     def add_clauses(self, cs):
-        for c in cs:
-            self.add_clause(c)
+        self.add_clauses_flat(flatten_clauses(cs))
 
-    def write_dimacs(self, filename, assumptions=(), extra_clauses=()):
-        with open(filename, "wb") as f:
-            n_clauses = self.n_clauses + len(assumptions) + len(extra_clauses)
-            n_vars = self.n_vars
-            f.write(b"p cnf %d %d\n" % (n_vars, n_clauses))
+    def add_clauses_flat(self, lits):
+        self.n_clauses += count_clauses(lits)
+        write_clauses(self._file, lits)
+        self._check_spill()
+
+    def start_clause_log(self):
+        pass
+
+    @property
+    def clause_log(self):
+        """The body parsed back (see CNF.fork)."""
+        return parse_clauses(b"".join(self._body()))
+
+    def __getstate__(self):
+        # the body is kept as it is (not as clause_log)
+        state = {
+            key: value for key, value in self.__dict__.items()
+            if key not in self.BACKEND_STATE
+        }
+        state["_body"] = b"".join(self._body())
+        # the copy spills into a fresh temporary file (if needed)
+        state["_backing_file"] = None
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        body = state.pop("_body")
+        self.__dict__.update(state)
+        self.init_solver(self.solver)
+        self.__dict__.update(state)
+        self._file.write(body)
+        self._check_spill()
+
+    @property
+    def spilled(self):
+        return self._spilled
+
+    def _check_spill(self):
+        if (
+            not self._spilled
+            and self._spill_threshold is not None
+            and self._file.tell() > self._spill_threshold
+        ):
+            self._spill()
 
-            f.write(self._file.getbuffer())
+    def _spill(self):
+        if self._backing_file is not None:
+            f = open(self._backing_file, "w+b")
+        else:
+            f = NamedTemporaryFile(prefix="optisolveapi-", suffix=".cnf")
+        f.write(b" " * self.HEADER_SIZE)
+        f.write(self._file.getbuffer())
+        self._file = f
+        self._spilled = True
 
-            if assumptions:
-                for v in assumptions:
-                    f.write(b"%d 0\n" % v)
-            if extra_clauses:
-                for c in extra_clauses:
-                    f.write(b" ".join(b"%d" % v for v in c))
-                    f.write(b" 0\n")
+    def _write_header_inplace(self, n_clauses):
+        header = b"p cnf %d %d\n" % (self.n_vars, n_clauses)
+        pad = self.HEADER_SIZE - len(header) - 2
+        assert pad >= 0
+        # pad with a comment line to keep the body in place
+        self._file.seek(0)
+        self._file.write(header + b"c" + b" " * pad + b"\n")
+        self._file.seek(0, 2)
+
+    def _body(self):
+        """Body chunks without copying the in-memory buffer."""
+        if not self._spilled:
+            with self._file.getbuffer() as buf:
+                for i in range(0, len(buf), CHUNK):
+                    yield buf[i:i+CHUNK]
+            return
+        self._file.flush()
+        end = self._file.tell()
+        with open(self._file.name, "rb") as f:
+            f.seek(self.HEADER_SIZE)
+            while f.tell() < end:
+                yield f.read(min(CHUNK, end - f.tell()))
+
+    def dimacs_chunks(self, assumptions=(), extra_clauses=()):
+        """DIMACS file contents as bytes chunks."""
+        self.flush()
+        f = BytesIO()
+        n_clauses = self.n_clauses + len(assumptions) + len(extra_clauses)
+        write_header(f, self.n_vars, n_clauses)
+        yield f.getvalue()
+
+        yield from self._body()
+
+        f = BytesIO()
+        write_clauses(f, flatten_clauses([v] for v in assumptions))
+        write_clauses(f, flatten_clauses(extra_clauses))
+        yield f.getvalue()
+
+    def write_dimacs(self, filename, assumptions=(), extra_clauses=()):
+        """Write DIMACS (compressed if filename ends with .gz/.xz/.bz2)."""
+        with open_file(filename, "wb") as f:
+            for chunk in self.dimacs_chunks(assumptions, extra_clauses):
+                f.write(chunk)
 
     def set_solver(self, solver):
         self._solver = solver
 
     def solve(self, assumptions=(), extra_clauses=(), log=True):
         assert self._solver, "solver not set"
+        self.flush()
+        if getattr(self._solver, "stdin", False):
+            return self._solver.solve_stream(
+                self.dimacs_chunks(assumptions, extra_clauses),
+                log=log,
+            )
+        if self._spilled:
+            return self._solve_inplace(assumptions, extra_clauses, log)
+
         with NamedTemporaryFile() as f:
             self.write_dimacs(
                 f.name,
@@ -75,5 +363,37 @@ class Writer(CNF):
             )
             return self._solver.solve_file(filename=f.name, log=log)
 
+    async def solve_async(self, assumptions=(), extra_clauses=(), log=True, timeout=None):
+        """
+        Coroutine solving through the solver's stdin (see ExtSolver),
+        no file is written.
+        """
+        assert self._solver, "solver not set"
+        self.flush()
+        return await self._solver.solve_stream_async(
+            self.dimacs_chunks(assumptions, extra_clauses),
+            log=log,
+            timeout=timeout,
+        )
+
+    def _solve_inplace(self, assumptions, extra_clauses, log):
+        f = self._file
+        end = f.tell()
+        try:
+            self._write_header_inplace(
+                self.n_clauses + len(assumptions) + len(extra_clauses)
+            )
+            write_clauses(f, flatten_clauses([v] for v in assumptions))
+            write_clauses(f, flatten_clauses(extra_clauses))
+            f.flush()
+            return self._solver.solve_file(filename=f.name, log=log)
+        finally:
+            f.truncate(end)
+            f.seek(end)
+
     def copy(self):
-        return deepcopy(self)
+        res = deepcopy(self)
+        # the copy of a spilled body always spills into a fresh temporary file
+        if self._spilled and not res._spilled:
+            res._spill()
+        return res
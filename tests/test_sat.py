@@ -1,6 +1,10 @@
+import sys
+import time
+import asyncio
 from tempfile import NamedTemporaryFile
 
-from optisolveapi.sat import ExtSolver
+from optisolveapi.sat import CNF, ExtSolver, Writer
+from optisolveapi.sat.ext import ARG_FLAGS, ARG_DIMACS
 
 
 UNSAT = """
@@ -29,3 +33,116 @@ def test_ext():
         f.write(SAT)
         f.flush()
         assert K.solve_file(f.name)
+
+
+# external "solver" for tests, in case kissat is not available
+# (reads DIMACS from the given file or stdin)
+PYSAT_CMD = [
+    sys.executable, "-c",
+    """if 1:
+    import sys
+    from pysat.formula import CNF
+    from pysat.solvers import Solver
+    if len(sys.argv) > 1:
+        cnf = CNF(from_file=sys.argv[-1])
+    else:
+        cnf = CNF(from_fp=sys.stdin)
+    with Solver(name="cd19", bootstrap_with=cnf) as S:
+        if S.solve():
+            print("s SATISFIABLE")
+            print("v", *S.get_model(), 0)
+        else:
+            print("s UNSATISFIABLE")
+    """,
+    ARG_FLAGS, ARG_DIMACS,
+]
+HANGING_CMD = [
+    sys.executable, "-c", "import time; time.sleep(1000)",
+    ARG_FLAGS, ARG_DIMACS,
+]
+BUSY_CMD = [sys.executable, "-c", "while True: pass", ARG_FLAGS, ARG_DIMACS]
+
+
+class PySATExt(ExtSolver):
+    CMD = PYSAT_CMD
+
+
+class HangingExt(ExtSolver):
+    CMD = HANGING_CMD
+
+
+CNF.register("ext/test-pysat")(PySATExt)
+CNF.register("ext/test-hanging")(HangingExt)
+
+
+def test_ext_cnf():
+    for stdin in (False, True):
+        C = ExtSolver(command=PYSAT_CMD, stdin=stdin)
+        a, b = C.vars(2)
+        C.add_clauses([[a, b], [-a, b]])
+        sol = C.solve()
+        assert C.sol_eval(sol, [b]) == (1,)
+        assert C.solve(assumptions=[-b]) is False
+
+
+def test_ext_output():
+    K = ExtSolver(command=PYSAT_CMD)
+    out = b"c comment\ns SATISFIABLE\nv 1 -2\nv 3 0\n"
+    assert K._result(out, 0, log=True) == {1: 1, 2: 0, 3: 1}
+    assert K._result(b"s UNSATISFIABLE\n", 0, log=False) is False
+    assert K._result(b"s UNKNOWN\n", 0, log=False) is None
+
+
+def test_ext_stdin():
+    W = Writer.new(solver="writer")
+    W.set_solver(ExtSolver(command=PYSAT_CMD, stdin=True))
+    x = W.vars(3)
+    W.add_clauses([[x[0], x[1]], [-x[1], x[2]]])
+    sol = W.solve(assumptions=[-x[0]])
+    assert W.sol_eval(sol, x) == (0, 1, 1)
+
+    K = ExtSolver(command=PYSAT_CMD)
+    assert K.solve_stream([UNSAT.encode()]) is False
+    assert K.solve_stream([SAT[:5].encode(), SAT[5:].encode()])
+
+
+def test_ext_limits():
+    t0 = time.time()
+    K = ExtSolver(command=HANGING_CMD, timeout=0.5)
+    assert K.solve() is None
+    K = ExtSolver(command=BUSY_CMD, cpu_limit=1)
+    assert K.solve() is None
+    assert time.time() - t0 < 30
+
+
+def test_ext_async():
+    async def main():
+        jobs = []
+        for i in range(4):
+            W = Writer.new(solver="writer")
+            W.set_solver(ExtSolver(command=PYSAT_CMD))
+            x = W.vars(2)
+            W.add_clause([x[0], x[1]])
+            jobs.append(W.solve_async(assumptions=[-x[i % 2]]))
+
+        K = ExtSolver(command=HANGING_CMD)
+        jobs.append(K.solve_async(timeout=0.5))
+        res = await asyncio.gather(*jobs)
+        assert res[-1] is None
+        for i, sol in enumerate(res[:-1]):
+            assert sol[2 + (i % 2)] == 0
+            assert sol[2 + 1 - (i % 2)] == 1
+
+        hanging = asyncio.ensure_future(K.solve_async())
+        await asyncio.sleep(0.2)
+        hanging.cancel()
+        try:
+            await hanging
+        except asyncio.CancelledError:
+            pass
+        else:
+            assert False, "not cancelled"
+
+    t0 = time.time()
+    asyncio.run(main())
+    assert time.time() - t0 < 30
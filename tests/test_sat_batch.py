@@ -0,0 +1,43 @@
+from optisolveapi.sat import CNF
+
+
+def test_clause_buffer():
+    C = CNF.new(solver="pysat/cadical195")
+    a, b = C.vars(2)
+    C.add_clause([a, b])
+    C.add_clause([-a])
+    # buffered clauses are flushed before solving
+    assert C._pending
+    assert C.sol_eval(C.solve(), [a, b]) == (0, 1)
+    assert not C._pending
+
+    C.CLAUSE_BUFFER = 3
+    C.add_clauses([[a, b], [a, -b]])
+    assert len(C._pending) == 2
+    C.add_clause([b])
+    assert not C._pending
+    assert C.solve() is False
+
+
+def test_clause_buffer_copies():
+    C = CNF.new(solver="pysat/cadical195")
+    a, b = C.vars(2)
+    c = [a]
+    C.add_clauses([c])
+    c.append(b)
+    C.add_clause([-a])
+    assert C.solve() is False
+
+
+def test_batch():
+    C = CNF.new(solver="pysat/cadical195")
+    C.CLAUSE_BUFFER = 1
+    xs = C.vars(20)
+    with C.batch():
+        C.Card(xs, limit=3)
+        with C.batch():
+            C.add_clause([xs[0]])
+        assert len(C._pending) > 20
+    assert not C._pending
+    assert C.n_clauses > 20
+    assert C.sol_eval(C.solve(), xs[:1]) == (1,)
@@ -0,0 +1,74 @@
+from itertools import product
+from random import Random
+
+from optisolveapi.sat import CNF, BitVec
+
+
+def check_ops(method, n=4):
+    C = CNF.new(solver="pysat/cadical195")
+    BitVec.ADD = method
+    x = BitVec.new(C, n)
+    y = BitVec.new(C, n)
+    mask = 2**n - 1
+    rol = lambda a: (a << 1 | a >> (n - 1)) & mask
+    bits = lambda a: [a >> i & 1 for i in reversed(range(n))]
+    ops = {
+        "add": (x + y, lambda a, b: (a + b) & mask),
+        "sub": (x - y, lambda a, b: (a - b) & mask),
+        "neg": (-x, lambda a, b: -a & mask),
+        "xor": (x ^ y, lambda a, b: a ^ b),
+        "and": (x & 5, lambda a, b: a & 5),
+        "or": (3 | y, lambda a, b: b | 3),
+        "not": (~y, lambda a, b: ~b & mask),
+        "mul": (x * 11, lambda a, b: a * 11 & mask),
+        "arx": ((x + y).rol(1) ^ y, lambda a, b: rol((a + b) & mask) ^ b),
+    }
+    sign = lambda a: a - 2**n if a >> (n - 1) else a
+    preds = {
+        "eq": (x.eq(y), lambda a, b: a == b),
+        "ne": (x.ne(3), lambda a, b: a != 3),
+        "ult": (x.ult(y), lambda a, b: a < b),
+        "ule": (x.ule(y), lambda a, b: a <= b),
+        "ugt": (x.ugt(y), lambda a, b: a > b),
+        "uge": (x.uge(y), lambda a, b: a >= b),
+        "slt": (x.slt(y), lambda a, b: sign(a) < sign(b)),
+        "sle": (x.sle(y), lambda a, b: sign(a) <= sign(b)),
+    }
+    s, c = x.add(y, carry=C.ONE)
+
+    for a, b in product(range(2**n), repeat=2):
+        sol = C.solve(assumptions=(
+            C.make_assumption(x, bits(a)) + C.make_assumption(y, bits(b))
+        ))
+        assert x.eval(sol) == a and y.eval(sol) == b
+        for name, (vec, f) in ops.items():
+            assert vec.eval(sol) == f(a, b), (method, name, a, b)
+        for name, (lit, f) in preds.items():
+            assert C.sol_eval(sol, [lit]) == (int(f(a, b)),), (method, name, a, b)
+        assert s.eval(sol) + 2**n * C.sol_eval(sol, [c])[0] == a + b + 1
+
+
+def test_bitvec():
+    try:
+        for method in ("ripple", "cla"):
+            check_ops(method)
+    finally:
+        BitVec.ADD = "ripple"
+
+
+def test_bitvec_sharing():
+    C = CNF.new(solver="pysat/cadical195")
+    x = BitVec.new(C, 16)
+    y = BitVec.new(C, 16)
+    z = x + y
+    n_vars = C.n_vars
+    assert z == y + x == x.add(y)[0]
+    assert C.n_vars == n_vars
+    assert isinstance(z.rol(3), BitVec)
+
+    rnd = Random(1)
+    a, b = rnd.getrandbits(16), rnd.getrandbits(16)
+    C.add_clause([x.eq(a)])
+    C.add_clause([(x + y).eq((a + b) % 2**16)])
+    sol = C.solve()
+    assert y.eval(sol) == b
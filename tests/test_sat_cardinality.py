@@ -27,6 +27,150 @@ def test_cardinality():
             assert nsol == 2**n, nsol
 
 
+def test_cardinality_encodings():
+    for encoding in ("seq", "totalizer", "mtotalizer", "sortnet"):
+        for n in range(1, 8):
+            for k in (1, 2, n - 1, n, n + 2):
+                if k < 1:
+                    continue
+                C = CNF.new(solver="pysat/cadical195")
+                xs = C.vars(n)
+                card = C.Card(xs, limit=k, encoding=encoding)
+                assert len(card) == k + 1
+                nsol = 0
+                for sol in C.solve_all():
+                    nsol += 1
+                    vxs = C.sol_eval(sol, xs)
+                    vcard = C.sol_eval(sol, card)
+                    for i, vc in enumerate(vcard):
+                        assert vc == (sum(vxs) >= i), (encoding, n, k)
+                assert nsol == 2**n, (encoding, n, k, nsol)
+
+
+def test_cardinality_long():
+    for encoding in ("seq", "totalizer", "mtotalizer", "sortnet"):
+        C = CNF.new(solver="pysat/cadical195")
+        xs = C.vars(3000)
+        card = C.Card(xs, limit=3, encoding=encoding)
+        C.CardLEk(card, 2)
+        sol = C.solve(assumptions=xs[100:102])
+        assert sum(C.sol_eval(sol, xs)) == 2
+        assert C.solve(assumptions=xs[100:103]) is False
+
+
+def test_cardinality_cache():
+    C = CNF.new(solver="pysat/cadical195")
+    xs = C.vars(6)
+    card1 = C.Card(xs[:4], limit=3)
+    n_vars = C.n_vars
+    card2 = C.Card(xs, limit=3)
+    # only the counters for the last two prefixes are added
+    assert C.n_vars - n_vars == 6
+    assert C.card_cache_stats == {"hits": 4, "misses": 6}
+
+    assert C.Card(xs, limit=3) == card2
+    assert C.Card(xs, limit=3, encoding="totalizer") != card2
+    assert C.Card(xs, limit=3, encoding="totalizer") == \
+        C.Card(xs, limit=3, encoding="totalizer")
+    assert C.card_cache_stats == {"hits": 12, "misses": 7}
+
+    n_vars = C.n_vars
+    n_clauses = C.n_clauses
+    C.Card(xs, limit=3)
+    assert (C.n_vars, C.n_clauses) == (n_vars, n_clauses)
+
+    for sol in C.solve_all():
+        vxs = C.sol_eval(sol, xs)
+        assert C.sol_eval(sol, card1) == tuple(
+            int(sum(vxs[:4]) >= i) for i in range(4)
+        )
+        assert C.sol_eval(sol, card2) == tuple(
+            int(sum(vxs) >= i) for i in range(4)
+        )
+
+
+def test_cardinality_numpy():
+    # the NumPy counter gives the same variables and clauses as the loop
+    for solver in ("formula", "writer"):
+        for n, limit, prefix, negate in (
+            (50, 10, 0, False),
+            (50, 100, 0, True),
+            (40, 5, 7, True),
+            (30, 30, 1, False),
+            (60, 2, 2, True),
+            (60, 1, 0, False),
+        ):
+            res = []
+            for cells in (10**12, 0):
+                C = CNF.new(solver=solver)
+                C.CARD_NUMPY_CELLS = cells
+                xs = C.vars(n)
+                if negate:
+                    xs = [-x if i % 3 == 0 else x for i, x in enumerate(xs)]
+                xs[n // 2] = C.ONE
+                if prefix:
+                    C.Card(xs[:prefix], limit=limit)
+                card = C.Card(xs, limit=limit)
+                C.CardLEk(card, min(limit, n) - 1)
+                C.CardGEk(card, 1)
+                C.CardLE(card[:3], C.vars(3))
+                if solver == "writer":
+                    body = b"".join(C.dimacs_chunks())
+                else:
+                    body = list(C.clauses)
+                res.append((card, C.n_vars, C.n_clauses, body))
+            assert res[0] == res[1]
+
+
+def test_cardinality_assumptions():
+    C = CNF.new(solver="pysat/cadical195")
+    xs = C.vars(8)
+    # x0 => x1, x2 => x3, ...
+    for a, b in zip(xs[::2], xs[1::2]):
+        C.add_clause([-a, b])
+    card = C.Card(xs, limit=6)
+    solver = C._solver
+    n_clauses = C.n_clauses
+
+    for lo in range(7):
+        for hi in range(lo, 6):
+            assumptions = C.CardGEkAssumptions(card, lo)
+            assumptions += C.CardLEkAssumptions(card, hi)
+            sol = C.solve(assumptions=assumptions)
+            assert sol
+            assert lo <= sum(C.sol_eval(sol, xs)) <= hi
+
+        sol = C.solve(assumptions=C.CardGEkAssumptions(card, lo) + [-xs[1]])
+        assert bool(sol) == (lo <= 6)
+
+    assert C.solve(assumptions=C.CardGEkAssumptions(card, 6) + [-xs[1], -xs[3]]) is False
+    assert C._solver is solver
+    assert C.n_clauses == n_clauses
+
+
+def test_cardinality_native():
+    from itertools import product
+
+    for solver in ("pysat/minicard", "pysat/cadical195"):
+        for n in range(1, 6):
+            for k in range(-1, n + 2):
+                C = CNF.new(solver=solver)
+                xs = C.vars(n)
+                ys = C.vars(n)
+                C.constraint_atmost(xs, k)
+                C.constraint_atleast(ys, k)
+                if solver == "pysat/minicard":
+                    assert C.native_card
+                    assert C.n_vars == 1 + 2 * n
+                # both constraints are in the same formula:
+                # atleast(ys, k) is unsatisfiable for k > n, atmost(xs, k) for k < 0
+                for vals in product(range(2), repeat=n):
+                    sol = C.solve(assumptions=C.make_assumption(xs, vals))
+                    assert bool(sol) == (sum(vals) <= k and k <= n), (solver, n, k)
+                    sol = C.solve(assumptions=C.make_assumption(ys, vals))
+                    assert bool(sol) == (sum(vals) >= k and k >= 0), (solver, n, k)
+
+
 def test_constraint_and():
     C = CNF.new(solver="pysat/cadical")
     a, b, ab = [C.var() for _ in range(3)]
@@ -53,5 +197,11 @@ def test_constraint_or():
 
 if __name__ == '__main__':
     test_cardinality()
+    test_cardinality_encodings()
+    test_cardinality_long()
+    test_cardinality_cache()
+    test_cardinality_numpy()
+    test_cardinality_assumptions()
+    test_cardinality_native()
     test_constraint_and()
     test_constraint_or()
@@ -0,0 +1,61 @@
+from itertools import product
+from random import Random
+
+from optisolveapi.sat import CNF, Formula, constraints
+
+
+def test_convex_bulk(monkeypatch):
+    rnd = Random(4)
+    n = 6
+    lb = [rnd.getrandbits(n) for _ in range(10)]
+    ub = [rnd.getrandbits(n) for _ in range(10)]
+
+    # same clauses as the per-point encoding, with and without NumPy
+    G = Formula()
+    xs = G.vars(n)
+    for mx in sorted(set(lb)):
+        G.constraint_remove_lower(xs, mx)
+    for mn in sorted(set(ub)):
+        G.constraint_remove_upper(xs, mn)
+    for numpy in (True, False):
+        monkeypatch.setattr(constraints, "has_numpy", numpy and constraints.has_numpy)
+        F = Formula()
+        assert F.vars(n) == xs
+        F.constraint_convex(xs, lb=lb, ub=ub)
+        assert list(F) == list(G)
+    monkeypatch.undo()
+
+    # minimized by the bitmap, pairwise beyond CONVEX_MINIMIZE_BITS
+    # and without NumPy: the same antichains
+    res = []
+    for numpy, bits in ((True, 24), (True, 0), (False, 24)):
+        monkeypatch.setattr(constraints, "has_numpy", numpy and constraints.has_numpy)
+        F = Formula()
+        F.CONVEX_MINIMIZE_BITS = bits
+        xs = F.vars(n)
+        F.constraint_convex(xs, lb=lb, ub=ub, minimize=True)
+        res.append(list(F))
+    monkeypatch.undo()
+    assert res[0] == res[1] == res[2]
+    assert len(res[0]) < 1 + len(set(lb)) + len(set(ub))
+
+    # no bitmap and no NumPy path for 64+ bits
+    F = Formula()
+    xs = F.vars(70)
+    top = 1 << 69
+    F.constraint_convex(xs, lb=[top, top | 1, 1], ub=[3, 1, top | 3], minimize=True)
+    assert F.n_clauses == 1 + 2
+
+    for minimize in (False, True):
+        C = CNF.new(solver="pysat/cadical195")
+        xs = C.vars(n)
+        C.constraint_convex(xs, lb=lb, ub=ub, minimize=minimize)
+        if minimize:
+            assert C.n_clauses < 1 + len(set(lb)) + len(set(ub))
+        for vals in product(range(2), repeat=n):
+            x = int("".join(map(str, vals)), 2)
+            ok = (
+                all(x & ~mx for mx in lb)
+                and all(mn & ~x for mn in ub)
+            )
+            assert bool(C.solve(assumptions=C.make_assumption(xs, vals))) == ok
@@ -0,0 +1,82 @@
+import pickle
+import multiprocessing
+
+import pytest
+
+from optisolveapi.sat import CNF, PySAT
+
+
+def build(solver):
+    C = CNF.new(solver=solver, clause_log=True)
+    xs = C.vars(6)
+    card = C.Card(xs, limit=4)
+    C.CardLEk(card, 3)
+    C.CardGEk(card, 2)
+    C.add_clauses([[xs[0], xs[1]], [-xs[0], -xs[1]]])
+    return C, xs
+
+
+def count(C, xs):
+    if not isinstance(C, PySAT):
+        C = C.fork(solver="pysat/cadical195")
+    return sum(1 for _ in C.solve_all(project=xs))
+
+
+def test_clause_log():
+    C = CNF.new(solver="pysat/cadical195")
+    with pytest.raises(ValueError):
+        C.clause_log
+    C, xs = build("pysat/cadical195")
+    F, _ = build("formula")
+    assert list(C.clause_log) == list(F.clause_log)
+    W, _ = build("writer")
+    assert list(W.clause_log) == list(F.clause_log)
+
+
+def test_fork():
+    for solver in ("pysat/cadical195", "formula", "writer"):
+        C, xs = build(solver)
+        n_vars = C.n_vars
+        card = C.Card(xs, limit=4)
+        for target in (None, "pysat/glucose4", "formula"):
+            D = C.fork(solver=target)
+            assert D.solver == (target or solver)
+            assert (D.n_vars, D.n_clauses) == (C.n_vars, C.n_clauses)
+            # the counter is cached in the copy too
+            assert D.Card(xs, limit=4) == card
+            assert D.n_vars == n_vars
+            # one of xs[0], xs[1], 1 or 2 of the other 4
+            assert count(D, xs) == 20
+            # the branches are independent
+            D.add_clause([xs[2]])
+            assert count(D, xs) == 8
+        assert count(C, xs) == 20
+
+
+def test_fork_pysat_native():
+    C = CNF.new(solver="pysat/minicard", clause_log=True)
+    xs = C.vars(4)
+    # replayable clauses instead of a native constraint
+    C.constraint_atmost(xs, 1)
+    D = C.fork()
+    assert count(D, xs) == 5
+
+
+def test_pickle():
+    for solver in ("pysat/cadical195", "formula", "writer"):
+        C, xs = build(solver)
+        D = pickle.loads(pickle.dumps(C))
+        assert type(D) is type(C)
+        assert (D.n_vars, D.n_clauses) == (C.n_vars, C.n_clauses)
+        assert list(D.clause_log) == list(C.clause_log)
+        assert count(D, xs) == 20
+
+
+def _count_worker(C, xs):
+    return count(C, xs)
+
+
+def test_pickle_multiprocessing():
+    C, xs = build("pysat/cadical195")
+    with multiprocessing.Pool(2) as pool:
+        assert pool.starmap(_count_worker, [(C, xs), (C, xs)]) == [20, 20]
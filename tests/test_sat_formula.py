@@ -0,0 +1,240 @@
+import bz2
+import gzip
+import lzma
+import os
+from random import Random
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+
+from optisolveapi.sat import CNF, Formula, Writer, formats
+
+
+def test_formula_store():
+    F = Formula()
+    a, b, c = F.vars(3)
+    F.add_clause([a, -b])
+    F.add_clauses([[b, c], [-c]])
+    assert F.n_clauses == 4
+    assert len(F.clauses) == 4
+    assert list(F) == [[-1], [a, -b], [b, c], [-c]]
+    assert F.clauses[0] == [-F.ZERO] == [-1]
+    assert F.clauses[-1] == [-c]
+    assert list(F.clauses[1:3]) == [[a, -b], [b, c]]
+
+    G = F.copy()
+    G.add_clause([a])
+    assert len(F.clauses) == 4
+    assert len(G.clauses) == 5
+
+
+def test_formula_write_dimacs():
+    F = Formula()
+    a, b = F.vars(2)
+    F.add_clause([a, -b])
+    with NamedTemporaryFile() as f:
+        F.write_dimacs(f.name, assumptions=[b], extra_clauses=[[-a, b]])
+        assert f.read() == b"p cnf 3 4\n-1 0\n2 -3 0\n3 0\n-2 3 0\n"
+
+
+def test_formula_apply():
+    F = Formula()
+    x = F.vars(2)
+    F.constraint_and(x[0], x[1], F.ONE)
+
+    C = CNF.new(solver="pysat/cadical195")
+    y = C.vars(4)
+    C.apply(F, [y[0], -y[1]])
+    C.apply(F, [-y[2], y[3]])
+    sol = C.solve()
+    assert C.sol_eval(sol, y) == (1, 0, 0, 1)
+
+
+def test_formula_template():
+    # y = x0 & x1 & x2 through an auxiliary t = x0 & x1
+    F = Formula()
+    x = F.vars(4)
+    t = F.var()
+    F.constraint_and(x[0], x[1], t)
+    F.constraint_and(t, x[2], x[3])
+    T = F.compile(n_inputs=4)
+    assert (T.n_inputs, T.n_aux, T.n_clauses) == (4, 1, 6)
+
+    C = CNF.new(solver="pysat/cadical195")
+    y = C.vars(8)
+    aux = C.apply(T, y[:4])
+    assert aux == [C.n_vars]
+    auxs = C.apply_many(T, [y[4:], [-v for v in y[4:7]] + [C.ONE]])
+    assert auxs == [[C.n_vars - 1], [C.n_vars]]
+    for sol in C.solve_all(project=y):
+        vy = C.sol_eval(sol, y)
+        assert vy[3] == vy[0] & vy[1] & vy[2]
+        assert vy[7] == vy[4] & vy[5] & vy[6]
+        assert 1 == (1 - vy[4]) & (1 - vy[5]) & (1 - vy[6])
+
+    # bulk copies are the same as copies one by one
+    G1 = Formula()
+    G2 = Formula()
+    inps = [G1.vars(4) for _ in range(5)]
+    G2.vars(20)
+    for inp in inps:
+        T.instantiate(G1, inp)
+    T.instantiate_many(G2, inps)
+    assert G1.n_vars == G2.n_vars == 26
+    assert list(G1) == list(G2)
+
+
+def test_encode_clauses():
+    cs = [[1, -2], [], [2147483647, -2147483647, 10, -10]] * 50
+    lits = formats.flatten_clauses(cs)
+    ref = b"".join(
+        b" ".join(b"%d" % v for v in c + [0]) + b"\n" for c in cs
+    )
+    assert formats.encode_clauses(lits) == ref
+    assert formats._encode_clauses_python(lits) == ref
+    assert formats.split_clauses(lits) == cs
+    assert formats.count_clauses(lits) == len(cs)
+
+
+def test_decode_model():
+    lits = [(-1) ** (v % 3) * v for v in range(1, 200)] + [0]
+    data = b"".join(b" %d\n" % v for v in lits)
+    ref = bytearray([0] + [int(v > 0) for v in lits[:-1]] + [0] * 10)
+    assert formats.decode_model(data, n_vars=209) == ref
+    assert formats._decode_model_python(data, n_vars=209) == ref
+    assert formats.decode_model(b" 2 -3 0", n_vars=1) == bytearray([0, 0, 1, 0])
+
+
+def test_writer_add_clauses():
+    W = Writer.new(solver="writer")
+    a, b = W.vars(2)
+    W.add_clause([a, -b])
+    W.add_clauses([[b], [-a, b]])
+    W.add_clauses_flat([a, 0, b, -a, 0])
+    assert W.n_clauses == 6
+    with NamedTemporaryFile() as f:
+        W.write_dimacs(f.name, assumptions=[a], extra_clauses=[[-b]])
+        assert f.read() == (
+            b"p cnf 3 8\n-1 0\n2 -3 0\n3 0\n-2 3 0\n2 0\n3 -2 0\n2 0\n-3 0\n"
+        )
+
+
+class _ReadFile:
+    def solve_file(self, filename, log=True):
+        with open(filename, "rb") as f:
+            return f.read()
+
+
+def test_writer_spill():
+    W = Writer.new(solver="writer", spill_threshold=20)
+    W.set_solver(_ReadFile())
+    a, b = W.vars(2)
+    W.add_clause([a, -b])
+    assert not W.spilled
+    W.add_clauses([[b], [-a, b], [a, b]])
+    assert W.spilled
+
+    body = b"-1 0\n2 -3 0\n3 0\n-2 3 0\n2 3 0\n"
+    data = W.solve(assumptions=[a])
+    header, comment, rest = data.split(b"\n", 2)
+    assert len(header) + len(comment) + 2 == W.HEADER_SIZE
+    assert header == b"p cnf 3 6" and comment.strip() == b"c"
+    assert rest == body + b"2 0\n"
+
+    W.add_clause([-a])
+    body += b"-2 0\n"
+    data = W.solve(extra_clauses=[[-b]])
+    assert data.split(b"\n", 2)[2] == body + b"-3 0\n"
+
+    with NamedTemporaryFile() as f:
+        W.write_dimacs(f.name)
+        assert f.read() == b"p cnf 3 6\n" + body
+
+    W2 = W.copy()
+    W2.add_clause([b])
+    assert W2.solve().split(b"\n", 2)[2] == body + b"3 0\n"
+    assert W.solve().split(b"\n", 2)[2] == body
+
+
+def test_writer_backing_file():
+    with NamedTemporaryFile() as f:
+        W = Writer.new(solver="writer", backing_file=f.name)
+        W.set_solver(_ReadFile())
+        assert W.spilled
+        a = W.var()
+        W.add_clause([a])
+        assert W.solve().split(b"\n", 2)[2] == b"-1 0\n2 0\n"
+
+
+def test_from_dimacs():
+    rnd = Random(9)
+    # satisfied by the planted assignment
+    planted = {v: rnd.choice((1, -1)) for v in range(1, 31)}
+    cs = []
+    for _ in range(300):
+        vs = rnd.sample(range(1, 31), rnd.randint(1, 4))
+        cs.append([planted[vs[0]] * vs[0]] + [rnd.choice((1, -1)) * v for v in vs[1:]])
+    text = "c random\np cnf 31 300\n" + "".join(
+        # clauses split across lines and comments in between
+        " ".join(map(str, c[:1])) + "\n" + " ".join(map(str, c[1:] + [0])) + "\n"
+        + ("c comment\n" if i % 50 == 0 else "")
+        for i, c in enumerate(cs)
+    ) + "%\n0\n"
+    shifted = [[v + 1 if v > 0 else v - 1 for v in c] for c in cs]
+
+    chunk = formats.CHUNK
+    with TemporaryDirectory() as tmp:
+        for ext, opener in (("", open), (".gz", gzip.open), (".xz", lzma.open), (".bz2", bz2.open)):
+            path = os.path.join(tmp, "test.cnf" + ext)
+            with opener(path, "wb") as f:
+                f.write(text.encode())
+            for formats.CHUNK in (7, 100, chunk):
+                F = CNF.from_dimacs(path, solver="formula")
+                assert list(F)[1:] == shifted
+                assert F.n_vars == 32
+        formats.CHUNK = chunk
+
+        C = CNF.from_dimacs(path, solver="pysat/cadical195")
+        assert C.n_clauses == 301
+        sol = C.solve()
+        assert all(any(C.sol_eval(sol, [v])[0] for v in c) for c in shifted)
+
+        # round trip, no shift for files written by this package
+        path = os.path.join(tmp, "round.cnf")
+        F.write_dimacs(path)
+        G = CNF.from_dimacs(path, solver="formula")
+        assert list(G) == list(F) and G.n_vars == F.n_vars
+        G = CNF.from_dimacs(path, solver="formula", shift=2)
+        assert list(G)[1][0] == -3
+
+
+def test_compressed_and_binary():
+    F = Formula()
+    xs = F.vars(10)
+    for i in range(9):
+        F.add_clause([xs[i], -xs[i + 1], xs[(3 * i) % 10]])
+    with TemporaryDirectory() as tmp:
+        for ext in (".gz", ".xz", ".bz2"):
+            W = Writer.new(solver="writer")
+            W.vars(10)
+            W.add_clauses_flat(F.clauses[1:].lits)
+            path = os.path.join(tmp, "test.cnf" + ext)
+            W.write_dimacs(path, assumptions=[xs[0]])
+            with formats.open_file(path) as f:
+                text = f.read()
+            assert text.startswith(b"p cnf 11 11\n-1 0\n") and text.endswith(b"\n2 0\n")
+            F.write_dimacs(path)
+            assert list(CNF.from_dimacs(path, solver="formula")) == list(F)
+
+        path = os.path.join(tmp, "test.bcnf")
+        F.write_binary(path)
+        for solver in ("formula", "writer", "pysat/cadical195"):
+            G = CNF.from_binary(path, solver=solver)
+            assert G.n_vars == F.n_vars and G.n_clauses == F.n_clauses
+        assert list(CNF.from_binary(path, solver="formula")) == list(F)
+        with open(path, "r+b") as f:
+            f.write(b"X")
+        try:
+            CNF.from_binary(path, solver="formula")
+        except ValueError:
+            pass
+        else:
+            assert False, "bad magic accepted"
@@ -0,0 +1,44 @@
+from itertools import product
+
+from optisolveapi.sat import CNF
+
+
+def test_gates():
+    C = CNF.new(solver="pysat/cadical195")
+    xs = C.vars(3)
+    lits = list(xs) + [-x for x in xs] + [C.ZERO, C.ONE]
+    gates = []
+    for a, b in product(lits, repeat=2):
+        gates.append((C.AND(a, b), lambda u, v: u & v, (a, b)))
+        gates.append((C.OR(a, b), lambda u, v: u | v, (a, b)))
+        gates.append((C.XOR(a, b), lambda u, v: u ^ v, (a, b)))
+    for c, t, e in product(lits, repeat=3):
+        gates.append((C.ITE(c, t, e), lambda c, t, e: t if c else e, (c, t, e)))
+
+    def value(vals, v):
+        if abs(v) == C.ZERO:
+            return int(v == C.ONE)
+        return vals[xs.index(abs(v))] ^ (v < 0)
+
+    for vals in product(range(2), repeat=len(xs)):
+        sol = C.solve(assumptions=C.make_assumption(xs, vals))
+        for out, f, args in gates:
+            ref = f(*[value(vals, v) for v in args])
+            got = int(out == C.ONE) if abs(out) == C.ZERO else C.sol_eval(sol, [out])[0]
+            assert got == ref, (f, args)
+
+
+def test_gates_sharing():
+    C = CNF.new(solver="pysat/cadical195")
+    a, b, c = C.vars(3)
+    ab = C.AND(a, b)
+    n_vars, n_clauses = C.n_vars, C.n_clauses
+    assert C.AND(b, a) == ab
+    assert C.OR(-a, -b) == -ab
+    assert C.XOR(a, b) == C.XOR(-b, -a) == -C.XOR(-a, b)
+    assert C.ITE(c, a, b) == C.ITE(-c, b, a) == -C.ITE(c, -a, -b)
+    assert C.n_vars == n_vars + 2
+    assert C.AND(a, C.ONE) == a and C.OR(a, C.ONE) == C.ONE
+    assert C.XOR(a, a) == C.ZERO and C.ITE(c, a, a) == a
+    assert C.n_vars == n_vars + 2
+    assert C.n_clauses == n_clauses + 4 + 6
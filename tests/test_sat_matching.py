@@ -0,0 +1,74 @@
+from itertools import product
+from random import Random
+
+from optisolveapi.sat import CNF
+
+
+def test_amo_encodings():
+    for encoding in ("pairwise", "ladder", "commander", "product", "bimander", "auto"):
+        for n in range(1, 11):
+            for eo in (False, True):
+                C = CNF.new(solver="pysat/cadical195")
+                xs = C.vars(n)
+                if eo:
+                    C.constraint_eo(xs, encoding=encoding)
+                else:
+                    C.constraint_amo(xs, encoding=encoding)
+                for vals in product(range(2), repeat=n):
+                    sol = C.solve(assumptions=C.make_assumption(xs, vals))
+                    ok = sum(vals) == 1 if eo else sum(vals) <= 1
+                    assert bool(sol) == ok, (encoding, n, eo, vals)
+
+
+def count_matchings(nu, nv, edges, UB, vals_u, vals_v):
+    # brute force over edge subsets
+    res = 0
+    for sel in product(range(2), repeat=len(edges)):
+        chosen = [e for e, s in zip(edges, sel) if s]
+        ok = all(vals_u[x] and vals_v[y] for y, x in chosen)
+        for x in range(nu):
+            k = sum(1 for y, xx in chosen if xx == x)
+            ok &= k == vals_u[x]
+        for y in range(nv):
+            k = sum(1 for yy, x in chosen if yy == y)
+            ok &= k <= 1 and (not UB or k == vals_v[y])
+        res += ok
+    return res
+
+
+def test_matching_edges_tuple():
+    # a tuple of 2 edges is not taken for a CSR pair
+    C = CNF.new(solver="pysat/cadical195")
+    u = C.vars(2)
+    v = C.vars(1)
+    e = C.constraint_matching(u, v, edges=((0, 0), (0, 1)))
+    assert sorted(e) == [(0, 0), (0, 1)]
+    assert C.solve(assumptions=[u[0], -u[1]])
+
+
+def test_matching_sparse():
+    rnd = Random(7)
+    nu, nv = 3, 4
+    for _ in range(3):
+        mat = [[int(rnd.random() < 0.4) for _ in range(nu)] for _ in range(nv)]
+        edges = [(y, x) for y in range(nv) for x in range(nu) if mat[y][x]]
+        indptr = [0]
+        indices = []
+        for row in mat:
+            indices += [x for x, w in enumerate(row) if w]
+            indptr.append(len(indices))
+
+        for UB in (False, True):
+            for inp in (dict(mat=mat), dict(edges=edges), dict(csr=(indptr, indices))):
+                C = CNF.new(solver="pysat/cadical195")
+                u = C.vars(nu)
+                v = C.vars(nv)
+                e = C.constraint_matching(u, v, UB=UB, **inp)
+                assert sorted(e) == edges
+                for vals in product(range(2), repeat=nu + nv):
+                    vals_u, vals_v = vals[:nu], vals[nu:]
+                    sols = list(C.solve_all(
+                        assumptions=C.make_assumption(list(u) + list(v), vals),
+                        project=list(e.values()),
+                    ))
+                    assert len(sols) == count_matchings(nu, nv, edges, UB, vals_u, vals_v)
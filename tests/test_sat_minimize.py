@@ -0,0 +1,46 @@
+from itertools import product
+from random import Random
+
+from optisolveapi.sat import CNF
+
+
+def test_minimize():
+    rnd = Random(5)
+    for _ in range(20):
+        n = rnd.randint(3, 8)
+        clauses = [
+            [rnd.choice((1, -1)) * rnd.randint(2, n + 1) for _ in range(rnd.randint(1, 3))]
+            for _ in range(rnd.randint(1, 3 * n))
+        ]
+        best = None
+        for vals in product(range(2), repeat=n):
+            if all(any(vals[abs(v)-2] ^ (v < 0) for v in c) for c in clauses):
+                best = sum(vals) if best is None else min(best, sum(vals))
+
+        for strategy in ("linear", "binary", "core"):
+            C = CNF.new(solver="pysat/cadical195")
+            xs = C.vars(n)
+            C.add_clauses(clauses)
+            res = C.minimize(xs, strategy=strategy)
+            assert res.optimum == best, (strategy, clauses)
+            assert res.iterations
+            if best is None:
+                assert res.sol is False
+            else:
+                assert sum(C.sol_eval(res.sol, xs)) == best
+                # nothing permanent was added
+                assert C.solve()
+
+
+def test_minimize_assumptions():
+    C = CNF.new(solver="pysat/cadical195")
+    xs = C.vars(6)
+    # at least one of each pair
+    for a, b in zip(xs[::2], xs[1::2]):
+        C.add_clause([a, b])
+    for strategy in ("linear", "binary", "core"):
+        res = C.minimize(xs, strategy=strategy)
+        assert res.optimum == 3
+        res = C.minimize(xs, strategy=strategy, assumptions=xs[:2])
+        assert res.optimum == 4
+        assert C.sol_eval(res.sol, xs[:2]) == (1, 1)
@@ -0,0 +1,60 @@
+import pickle
+
+from optisolveapi.sat import CNF, Model
+
+
+def test_model():
+    M = Model.from_pysat([1, -2, 3, -5], n_vars=6)
+    assert len(M) == 6
+    assert dict(M) == {1: 1, 2: 0, 3: 1, 4: 0, 5: 0, 6: 0}
+    assert M == {1: 1, 2: 0, 3: 1, 4: 0, 5: 0, 6: 0}
+    assert M[3] == 1 and M.get(7) is None
+    assert M.to_pysat() == [1, -2, 3, -4, -5, -6]
+    assert Model.from_pysat(M.to_pysat()) == M
+
+    lits = [1, -1, 2, -2, 0, 3, -6] * 5
+    ref = (1, 0, 0, 1, 1, 1) * 5
+    assert M.eval(lits) == ref
+    assert M.eval(lits[:7]) == ref[:6]
+    assert M.eval_many([[1, -2], [], [0, 3, -3]]) == [(1, 1), (), (1, 0)]
+    assert pickle.loads(pickle.dumps(M)) == M
+
+
+def test_model_solve():
+    C = CNF.new(solver="pysat/cadical195")
+    xs = C.vars(40)
+    for a, b in zip(xs, xs[1:]):
+        C.add_clause([-a, -b])
+        C.add_clause([a, b])
+    sol = C.solve(assumptions=[xs[0]])
+    assert isinstance(sol, Model)
+    assert C.sol_eval(sol, xs) == (1, 0) * 20
+    assert C.sol_eval(sol, -xs) == (0, 1) * 20
+    assert C.sol_eval_many(sol, xs.split(4)) == [(1, 0) * 5] * 4
+    assert sol[xs[1]] == 0
+
+
+def test_solve_all_project():
+    C = CNF.new(solver="pysat/cadical195")
+    xs = C.vars(4)
+    C.add_clause([xs[0], xs[1]])
+    # many free / auxiliary variables
+    aux = C.vars(200)
+    C.add_clause([-aux[0], xs[2]])
+
+    seen = set()
+    for sol in C.solve_all(project=xs[:2]):
+        seen.add(C.sol_eval(sol, xs[:2]))
+    assert seen == {(0, 1), (1, 0), (1, 1)}
+
+    sols = list(C.solve_all(assumptions=[-xs[0]], project=xs[1:3]))
+    assert sorted(C.sol_eval(sol, xs[1:3]) for sol in sols) == [(1, 0), (1, 1)]
+
+    # the solver is still usable, blocking clauses are disabled
+    sol = C.solve(assumptions=[xs[0], -xs[1], aux[0]])
+    assert C.sol_eval(sol, xs[:3]) == (1, 0, 1)
+
+    n = 0
+    for sol in C.solve_all(project=xs):
+        n += 1
+    assert n == 12
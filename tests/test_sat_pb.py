@@ -0,0 +1,58 @@
+from itertools import product
+from random import Random
+
+from optisolveapi.sat import CNF, Formula
+
+
+def check_pb(encoding, ws, k, ge=False, neg=()):
+    C = CNF.new(solver="pysat/cadical195")
+    xs = C.vars(len(ws))
+    lits = [-x if i in neg else x for i, x in enumerate(xs)]
+    if ge:
+        C.constraint_pb_ge(lits, ws, k, encoding=encoding)
+    else:
+        C.constraint_pb_le(lits, ws, k, encoding=encoding)
+
+    for vals in product(range(2), repeat=len(xs)):
+        sol = C.solve(assumptions=C.make_assumption(xs, vals))
+        total = sum(
+            w * (v ^ (i in neg)) for i, (w, v) in enumerate(zip(ws, vals))
+        )
+        assert bool(sol) == (total >= k if ge else total <= k), \
+            (encoding, ws, k, ge, neg, vals)
+
+
+def test_pb_encodings():
+    rnd = Random(1)
+    for encoding in ("bdd", "gte", "adder", "auto"):
+        check_pb(encoding, [3, 3, 3], 6)
+        check_pb(encoding, [5, 3, 2, 2], 6)
+        check_pb(encoding, [5, -3, 2, 7], 4, ge=True)
+        check_pb(encoding, [100, 1], -1)
+        for _ in range(20):
+            n = rnd.randint(1, 6)
+            ws = [rnd.randint(-50, 50) for _ in range(n)]
+            neg = {i for i in range(n) if rnd.randrange(3) == 0}
+            check_pb(encoding, ws, rnd.randint(-20, 60), rnd.randrange(2), neg)
+
+
+def test_pb_infeasible():
+    F = Formula()
+    x = F.var()
+    F.constraint_pb_le([x], [1], -1)
+    assert list(F)[-1] == [F.ZERO]
+
+
+def test_pb_large_weights():
+    rnd = Random(2)
+    ws = [rnd.randint(1, 10**6) for _ in range(40)]
+    k = sum(ws) // 3
+
+    C = CNF.new(solver="pysat/cadical195")
+    xs = C.vars(len(ws))
+    C.constraint_pb_le(xs, ws, k)
+    C.constraint_pb_ge(xs, ws, k - 10**5)
+    assert C.n_clauses < 20000
+    sol = C.solve()
+    total = sum(w * v for w, v in zip(ws, C.sol_eval(sol, xs)))
+    assert k - 10**5 <= total <= k
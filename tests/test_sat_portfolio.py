@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+
+from optisolveapi.sat import CNF, Formula, Portfolio
+
+# registers ext/test-pysat and ext/test-hanging
+import test_sat  # noqa: F401
+
+
+@CNF.register("test-exit")
+class ExitFormula(Formula):
+    def solve(self, assumptions=()):
+        # dies without posting a result
+        os._exit(1)
+
+
+@CNF.register("test-slow")
+class SlowFormula(Formula):
+    def solve(self, assumptions=()):
+        time.sleep(1)
+        return False
+
+
+def pigeons(C, n):
+    # n+1 pigeons, n holes
+    x = [C.vars(n) for _ in range(n + 1)]
+    for row in x:
+        C.add_clause(row)
+    for j in range(n):
+        for i1 in range(n + 1):
+            for i2 in range(i1):
+                C.add_clause([-x[i1][j], -x[i2][j]])
+    return x
+
+
+def test_portfolio():
+    solvers = ["pysat/cadical195", "pysat/glucose4", "pysat/minisat22"]
+    C = CNF.new(solver="portfolio", solvers=solvers)
+    assert isinstance(C, Portfolio)
+    x = pigeons(C, 4)
+    assert C.solve() is False
+    assert C.winner in solvers
+
+    C = Portfolio(solvers=solvers + ["pysat/no-such-solver"])
+    x = C.vars(4)
+    C.add_clause([x[0], x[1]])
+    C.add_clause([-x[1], x[2]])
+    sol = C.solve(assumptions=[-x[0]])
+    assert C.sol_eval(sol, x[:3]) == (0, 1, 1)
+    assert C.solve(assumptions=[-x[0], -x[2]]) is False
+
+
+def test_portfolio_ext():
+    t0 = time.time()
+    C = Portfolio(solvers=["ext/test-hanging", "ext/test-pysat"])
+    pigeons(C, 3)
+    assert C.solve() is False
+    assert C.winner == "ext/test-pysat"
+
+    x = C.vars(2)
+    sol = C.solve(assumptions=[x[0]])
+    assert sol is False
+
+    C = Portfolio(solvers=["ext/test-hanging", "ext/test-pysat"])
+    x = C.vars(2)
+    C.add_clause([-x[0], x[1]])
+    sol = C.solve(assumptions=[x[0]])
+    assert C.sol_eval(sol, x) == (1, 1)
+    assert time.time() - t0 < 100
+
+
+def test_portfolio_dead_worker():
+    t0 = time.time()
+    C = Portfolio(solvers=["test-exit", "pysat/cadical195"])
+    pigeons(C, 3)
+    assert C.solve() is False
+    assert C.winner == "pysat/cadical195"
+
+    C = Portfolio(solvers=["test-exit", "test-exit"])
+    pigeons(C, 3)
+    with pytest.raises(RuntimeError):
+        C.solve()
+    assert time.time() - t0 < 30
+
+
+def test_portfolio_kill_latency():
+    # the losers are busy inside PySAT's C solve() when killed
+    C = Portfolio(solvers=["test-slow", "pysat/cadical195", "pysat/glucose4"])
+    pigeons(C, 12)
+    t0 = time.time()
+    assert C.solve() is False
+    assert C.winner == "test-slow"
+    assert time.time() - t0 < 3
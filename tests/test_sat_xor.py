@@ -0,0 +1,113 @@
+from itertools import product
+from random import Random
+from tempfile import NamedTemporaryFile
+
+from optisolveapi.sat import CNF, Formula
+
+
+def check_xor_system(gauss, n, eqs):
+    C = CNF.new(solver="pysat/cadical195")
+    C.XOR_GAUSS = gauss
+    xs = C.vars(n)
+    for idx, signs, rhs in eqs:
+        C.constraint_xor([-xs[i] if s else xs[i] for i, s in zip(idx, signs)], rhs)
+    if gauss:
+        assert C.xor_flush() <= len(eqs)
+
+    for vals in product(range(2), repeat=n):
+        ok = all(
+            sum(vals[i] ^ s for i, s in zip(idx, signs)) % 2 == rhs
+            for idx, signs, rhs in eqs
+        )
+        sol = C.solve(assumptions=C.make_assumption(xs, vals))
+        assert bool(sol) == ok, (gauss, eqs, vals)
+
+
+def test_xor():
+    rnd = Random(3)
+    for gauss in (False, True):
+        check_xor_system(gauss, 3, [([0, 1, 2], [0, 0, 0], 1)])
+        check_xor_system(gauss, 3, [([0, 0, 1], [0, 1, 0], 0)])
+        for _ in range(30):
+            n = rnd.randint(1, 8)
+            eqs = []
+            for _ in range(rnd.randint(1, n + 1)):
+                k = rnd.randint(1, n)
+                idx = rnd.sample(range(n), k)
+                signs = [rnd.randrange(2) for _ in idx]
+                eqs.append((idx, signs, rnd.randrange(2)))
+            check_xor_system(gauss, n, eqs)
+
+
+def test_xor_gauss():
+    C = CNF.new(solver="pysat/cadical195")
+    C.XOR_GAUSS = True
+    x = C.vars(4)
+    C.constraint_xor([x[0], x[1], x[2]], 1)
+    C.constraint_xor([x[1], x[2]], 1)
+    C.constraint_xor([x[0], x[3]], 1)
+    # implied
+    C.constraint_xor([x[1], x[2], x[3]], 0)
+    assert C.xor_flush() == 3
+    sol = C.solve()
+    assert C.sol_eval(sol, [x[0], x[3]]) == (0, 1)
+
+    C.constraint_xor([x[0], C.ONE], 0)
+    C.xor_flush()
+    assert C.solve() is False
+
+
+def test_xor_gauss_solve():
+    # collected XORs are added on solve() without xor_flush()
+    C = CNF.new(solver="pysat/cadical195")
+    C.XOR_GAUSS = True
+    x, y = C.vars(2)
+    C.constraint_xor([x, y], 1)
+    C.add_clauses([[x], [y]])
+    assert C.solve() is False
+
+    for solver in ("writer", "formula"):
+        W = CNF.new(solver=solver)
+        W.XOR_GAUSS = True
+        x, y = W.vars(2)
+        W.constraint_xor([x, y], 1)
+        with NamedTemporaryFile() as f:
+            W.write_dimacs(f.name)
+            assert f.read() == b"p cnf 3 3\n-1 0\n2 3 0\n-2 -3 0\n"
+
+
+def test_xor_gauss_buffer():
+    # clause buffer flushes while encoding do not split the XOR system
+    C = CNF.new(solver="pysat/cadical195")
+    C.XOR_GAUSS = True
+    x = C.vars(2)
+    C.constraint_xor(x, 0)
+    C.Card(C.vars(2000), limit=3)
+    assert len(C._xor_rows) == 1
+    C.constraint_xor(x, 1)
+    assert C.xor_flush() == 0
+    assert C.solve() is False
+
+
+def test_xor_gauss_apply():
+    F = Formula()
+    F.XOR_GAUSS = True
+    a, b = F.vars(2)
+    F.constraint_xor([a, b], 1)
+    for T in (F, F.compile()):
+        C = CNF.new(solver="pysat/cadical195")
+        x, y = C.vars(2)
+        C.apply(T, [x, y])
+        assert C.solve(assumptions=[x, y]) is False
+        assert C.solve(assumptions=[x, -y])
+
+
+def test_xor_gate():
+    C = CNF.new(solver="pysat/cadical195")
+    C.XOR_CHUNK = 3
+    xs = C.vars(9)
+    t = C.Xor(xs)
+    for vals in product(range(2), repeat=len(xs)):
+        sol = C.solve(assumptions=C.make_assumption(xs, vals))
+        assert C.sol_eval(sol, [t]) == (sum(vals) % 2,)
+    assert C.Xor([C.ZERO, xs[0]]) == xs[0]